@@ -14,19 +14,23 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
 from channels.auth import AuthMiddlewareStack
-from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.routing import ChannelNameRouter, ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
 from django.core.asgi import get_asgi_application
 
-from base.routing import websocket_urlpatterns
+from base.authentication import TokenAuthMiddleware
+from base.routing import engine_channels, websocket_urlpatterns
 
 application = ProtocolTypeRouter({
     'http': get_asgi_application(),
     'websocket': AllowedHostsOriginValidator(
         AuthMiddlewareStack(
-            URLRouter(
-                websocket_urlpatterns
+            TokenAuthMiddleware(
+                URLRouter(
+                    websocket_urlpatterns
+                )
             )
         )
     ),
+    'channel': ChannelNameRouter(engine_channels),
 })
@@ -1,7 +1,29 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
 from rest_framework.authentication import TokenAuthentication
 from rest_framework import exceptions
 
-class BearerTokenAuthentication(TokenAuthentication):
+from .service.tokenCache import token_cache
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    DRF token authentication that remembers authenticated tokens
+    (base/service/tokenCache.py), so a polling client costs no query to
+    authenticate.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.put(token)
+        return (user, token)
+
+
+class BearerTokenAuthentication(CachedTokenAuthentication):
     """
     Simple token based authentication using utkn-apiauth.
 
@@ -13,14 +35,42 @@ class BearerTokenAuthentication(TokenAuthentication):
 
     keyword = 'Bearer'
 
-    def authenticate_credentials(self, key):
-        model = self.get_model()
-        try:
-            token = model.objects.select_related('user').get(key=key)
-        except model.DoesNotExist:
-            raise exceptions.AuthenticationFailed('Invalid token.')
 
-        if not token.user.is_active:
-            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+# Subprotocol naming the token: new WebSocket(url, ['token', key])
+TOKEN_SUBPROTOCOL = 'token'
+
+
+def scope_token(scope):
+    """The token key a WebSocket connection was opened with, or None."""
+    subprotocols = scope.get('subprotocols') or []
+    if len(subprotocols) >= 2 and subprotocols[0] == TOKEN_SUBPROTOCOL:
+        return subprotocols[1]
+    keys = parse_qs(scope.get('query_string', b'').decode()).get('token')
+    return keys[0] if keys else None
+
+
+@database_sync_to_async
+def get_token_user(key):
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except exceptions.AuthenticationFailed:
+        return None
+    return user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates a WebSocket with the same token as the REST API, once, when
+    it connects: ``?token=<key>`` or the subprotocols ``['token', <key>]``.
+
+    A valid token sets ``scope['user']``; otherwise the scope is left as the
+    session middleware around it made it.
+    """
 
-        return (token.user, token)
+    async def __call__(self, scope, receive, send):
+        key = scope_token(scope)
+        if key:
+            user = await get_token_user(key)
+            if user is not None:
+                scope = dict(scope, user=user)
+        return await super().__call__(scope, receive, send)
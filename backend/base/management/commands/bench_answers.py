@@ -0,0 +1,102 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from base.models import GameRoom, Player
+from base.service.scoringService import record_answer
+
+from .bench_broadcast import percentile
+
+USERNAME_PREFIX = 'bench_answers_'
+
+
+def _answer_rounds(player_id, rounds, barrier, latencies, errors):
+    players = Player.objects.filter(pk=player_id)
+    try:
+        for _ in range(rounds):
+            # Everyone answers at the same instant, as at the end of a countdown
+            barrier.wait()
+            started = time.perf_counter()
+            try:
+                record_answer(players, 1, 1.0)
+            except OperationalError:
+                errors.append(player_id)
+            else:
+                latencies.append(time.perf_counter() - started)
+            barrier.wait()
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure answer-write throughput of the configured database: one thread '
+        '(and connection) per player of a room, all recording their answer at '
+        'once, question after question. Run it once with DATABASE_URL set and '
+        'once without to compare PostgreSQL with SQLite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', default='10,50', help='Comma-separated room sizes to compare')
+        parser.add_argument('--rounds', type=int, default=50, help='Questions answered per room size')
+
+    def handle(self, *args, **options):
+        settings = connection.settings_dict
+        self.stdout.write(
+            f"{connection.vendor} {settings['NAME']} "
+            f"(CONN_MAX_AGE={settings['CONN_MAX_AGE']}, pool={bool(settings['OPTIONS'].get('pool'))})"
+        )
+        self.stdout.write(
+            f"{'players':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'answers/s':>10} {'errors':>7}"
+        )
+        for size in [int(p) for p in options['players'].split(',')]:
+            game = self.create_room(size)
+            try:
+                self.bench(game, size, options['rounds'])
+            finally:
+                User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def create_room(self, size):
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        users = [User(username=f'{USERNAME_PREFIX}{i}') for i in range(size)]
+        for user in users:
+            user.set_unusable_password()
+        users = User.objects.bulk_create(users)
+        game = GameRoom.objects.create(host=users[0], status='in_progress', max_players=size)
+        Player.objects.bulk_create([Player(user=user, game=game) for user in users])
+        return game
+
+    def bench(self, game, size, rounds):
+        player_ids = list(Player.objects.filter(game=game).values_list('id', flat=True))
+        # The workers plus this thread, which starts each question
+        barrier = threading.Barrier(size + 1)
+        latencies, errors = [], []
+        threads = [
+            threading.Thread(target=_answer_rounds, args=(player_id, rounds, barrier, latencies, errors))
+            for player_id in player_ids
+        ]
+        for thread in threads:
+            thread.start()
+
+        writing = 0.0
+        for _ in range(rounds):
+            barrier.wait()
+            started = time.perf_counter()
+            barrier.wait()
+            writing += time.perf_counter() - started
+            # Next question: everyone may answer again
+            Player.objects.filter(game=game).update(current_answer=None, answer_time=None)
+        for thread in threads:
+            thread.join()
+
+        self.stdout.write(
+            f"{size:>8} "
+            f"{percentile(latencies, 50) * 1000:>9.2f} "
+            f"{percentile(latencies, 95) * 1000:>9.2f} "
+            f"{percentile(latencies, 99) * 1000:>9.2f} "
+            f"{len(latencies) / writing:>10.0f} "
+            f"{len(errors):>7}"
+        )
@@ -0,0 +1,105 @@
+import asyncio
+import multiprocessing
+import time
+
+from channels.layers import InMemoryChannelLayer, channel_layers, get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+
+GROUP = 'game_BENCH'
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _receive_all(count, messages, ready, results):
+    layer = get_channel_layer()
+    channels = [await layer.new_channel() for _ in range(count)]
+    for channel in channels:
+        await layer.group_add(GROUP, channel)
+    ready.set()
+
+    async def drain(channel):
+        latencies = []
+        while len(latencies) < messages:
+            message = await layer.receive(channel)
+            latencies.append(time.time() - message['sent_at'])
+        return latencies
+
+    per_channel = await asyncio.gather(*(drain(c) for c in channels))
+    for channel in channels:
+        await layer.group_discard(GROUP, channel)
+    results.put([latency for latencies in per_channel for latency in latencies])
+
+
+def _worker(count, messages, ready, results):
+    # Each simulated ASGI worker gets its own connection to the shared layer
+    channel_layers.backends.clear()
+    asyncio.run(_receive_all(count, messages, ready, results))
+
+
+async def _send_all(messages, interval):
+    layer = get_channel_layer()
+    for i in range(messages):
+        await layer.group_send(GROUP, {'type': 'bench.tick', 'i': i, 'sent_at': time.time()})
+        await asyncio.sleep(interval)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure group_send fan-out latency over the configured channel layer '
+        'with the group members spread across 1..N worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,2,4', help='Comma-separated worker counts to compare')
+        parser.add_argument('--receivers', type=int, default=100, help='Sockets in the group, split across workers')
+        parser.add_argument('--messages', type=int, default=50, help='Broadcasts per run')
+        parser.add_argument('--interval', type=float, default=0.01, help='Seconds between broadcasts')
+
+    def handle(self, *args, **options):
+        if isinstance(get_channel_layer(), InMemoryChannelLayer):
+            raise CommandError(
+                'InMemoryChannelLayer cannot fan out across processes; '
+                'set CHANNEL_REDIS_URL to a running Redis (or compatible) server.'
+            )
+
+        ctx = multiprocessing.get_context('fork')
+        self.stdout.write(f"{'workers':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'deliveries/s':>13}")
+        for workers in [int(w) for w in options['workers'].split(',')]:
+            receivers = max(workers, options['receivers'])
+            per_worker = [receivers // workers + (1 if i < receivers % workers else 0) for i in range(workers)]
+
+            results = ctx.Queue()
+            ready = [ctx.Event() for _ in range(workers)]
+            procs = [
+                ctx.Process(target=_worker, args=(count, options['messages'], event, results))
+                for count, event in zip(per_worker, ready)
+            ]
+            for proc in procs:
+                proc.start()
+            for event in ready:
+                if not event.wait(30):
+                    raise CommandError('Timed out waiting for workers to subscribe')
+
+            channel_layers.backends.clear()
+            started = time.time()
+            asyncio.run(_send_all(options['messages'], options['interval']))
+            latencies = []
+            for _ in procs:
+                latencies.extend(results.get(timeout=60))
+            elapsed = time.time() - started
+            for proc in procs:
+                proc.join()
+
+            self.stdout.write(
+                f"{workers:>8} "
+                f"{percentile(latencies, 50) * 1000:>9.2f} "
+                f"{percentile(latencies, 95) * 1000:>9.2f} "
+                f"{percentile(latencies, 99) * 1000:>9.2f} "
+                f"{len(latencies) / elapsed:>13.0f}"
+            )
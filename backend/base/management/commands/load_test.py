@@ -0,0 +1,521 @@
+"""
+Simulated players for load testing.
+
+Creates N rooms of M players each and plays them through the whole game the
+way the frontend does: players join over REST, open ``ws/game/<code>/``,
+send ``player_ready``; the host starts the game once everyone is ready; every
+player answers each question after a random think time and refetches the
+game status (with its ETag); the host moves on once everyone has answered.
+
+By default the ASGI application is driven in this process (no server or
+other service needed), which also lets the command count the DB queries the
+server ran. With ``--url`` it connects to a running server instead, e.g.
+
+    daphne -p 8000 backend.asgi:application
+    python manage.py load_test --url http://127.0.0.1:8000 --server-pid <pid>
+
+Broadcast latency is measured from the moment a client sends an event to
+each delivery of the message it causes (a ready/answered patch, the next
+question) to the room's sockets.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from channels.worker import Worker
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.backends.signals import connection_created
+from rest_framework.authtoken.models import Token
+
+from base.models import GameRoom
+from base.routing import engine_channels
+from base.service.gameService import open_game
+from base.service.roomEngine import engine_shards
+
+from .bench_broadcast import percentile
+
+USERNAME_PREFIX = 'loadtest_'
+# Sockets opened at once while the rooms fill up
+CONNECT_CONCURRENCY = 200
+
+
+def make_quiz(questions, time_limit):
+    return {
+        'title': 'Load test',
+        'timePerQuestion': time_limit,
+        'questions': [
+            {'question': f'Question {i + 1}', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': i % 4}
+            for i in range(questions)
+        ],
+    }
+
+
+def remove_load_users():
+    """Delete the users (and with them the games) of previous runs."""
+    User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+
+def create_rooms(rooms, players, quiz):
+    """
+    Create ``rooms`` games with ``players`` users each, the first one
+    hosting. Returns ``[(code, [(user_id, username, token), ...]), ...]``.
+    """
+    remove_load_users()
+    users = [
+        User(username=f'{USERNAME_PREFIX}{room}_{seat}')
+        for room in range(rooms) for seat in range(players)
+    ]
+    for user in users:
+        user.set_unusable_password()
+    users = User.objects.bulk_create(users, batch_size=1000)
+    tokens = [Token(user=user) for user in users]
+    for token in tokens:
+        token.key = token.generate_key()
+    Token.objects.bulk_create(tokens, batch_size=1000)
+
+    result = []
+    for room in range(rooms):
+        seats = tokens[room * players:(room + 1) * players]
+        game = open_game(seats[0].user, quiz)
+        result.append((game.code, [(t.user.id, t.user.username, t.key) for t in seats]))
+    GameRoom.objects.filter(code__in=[code for code, _ in result]).update(max_players=players)
+    return result
+
+
+def rss_bytes(pid):
+    """Resident memory of process ``pid`` (Linux), or None."""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def message_keys(message):
+    """What a received message is the broadcast of, matching ``LoadRun.send`` keys."""
+    kind = message.get('type')
+    if kind == 'game_started':
+        return [('question', 0)]
+    keys = []
+    for op in message.get('ops', ()):
+        if op['op'] in ('ready', 'answered'):
+            keys.append((op['op'], op['username']))
+        elif op['op'] == 'question':
+            keys.append(('question', op['current_question']))
+        elif op['op'] == 'question_closed':
+            keys.append(('closed', op['current_question']))
+    return keys
+
+
+class QueryCounter:
+    """Counts the queries run on every DB connection opened while it is active."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._active = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._active:
+            with self._lock:
+                self.count += 1
+        return execute(sql, params, many, context)
+
+    def _install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def start(self):
+        # Connections are opened lazily by the threads serving the sockets and
+        # requests; the ones already open (this thread's) are closed first
+        close_old_connections()
+        connection_created.connect(self._install)
+        self._active = True
+
+    def stop(self):
+        self._active = False
+        connection_created.disconnect(self._install)
+
+
+class InProcessSocket:
+    def __init__(self, communicator):
+        self.communicator = communicator
+
+    @classmethod
+    async def connect(cls, application, path, timeout):
+        communicator = WebsocketCommunicator(application, path)
+        connected, _ = await communicator.connect(timeout)
+        if not connected:
+            raise CommandError(f'WebSocket connection to {path} was refused')
+        return cls(communicator)
+
+    async def send(self, message):
+        await self.communicator.send_to(text_data=json.dumps(message))
+
+    async def receive(self, timeout):
+        return json.loads(await self.communicator.receive_from(timeout))
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class NetworkSocket:
+    def __init__(self, protocol):
+        self.protocol = protocol
+
+    @classmethod
+    async def connect(cls, url, timeout):
+        # autobahn ships with daphne
+        from autobahn.asyncio.websocket import WebSocketClientFactory, WebSocketClientProtocol
+
+        class Protocol(WebSocketClientProtocol):
+            def __init__(self):
+                super().__init__()
+                self.opened = asyncio.get_running_loop().create_future()
+                self.inbox = asyncio.Queue()
+
+            def onOpen(self):
+                self.opened.set_result(True)
+
+            def onMessage(self, payload, isBinary):
+                self.inbox.put_nowait(json.loads(payload))
+
+            def onClose(self, wasClean, code, reason):
+                if not self.opened.done():
+                    self.opened.set_exception(CommandError(f'WebSocket connection to {url} failed: {reason}'))
+                self.inbox.put_nowait(None)
+
+        factory = WebSocketClientFactory(url)
+        factory.protocol = Protocol
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'wss' else 80)
+        _, protocol = await asyncio.get_running_loop().create_connection(
+            factory, parts.hostname, port, ssl=parts.scheme == 'wss' or None,
+        )
+        await asyncio.wait_for(protocol.opened, timeout)
+        return cls(protocol)
+
+    async def send(self, message):
+        self.protocol.sendMessage(json.dumps(message).encode())
+
+    async def receive(self, timeout):
+        message = await asyncio.wait_for(self.protocol.inbox.get(), timeout)
+        if message is None:
+            raise CommandError('The server closed a WebSocket connection')
+        return message
+
+    async def close(self):
+        self.protocol.sendClose()
+
+
+class LoadRun:
+    """Shared state and measurements of one run."""
+
+    def __init__(self, http, connect, timeout, think):
+        self.http = http
+        self.connect = connect      # coroutine function (code, token) -> socket
+        self.timeout = timeout
+        self.think = think
+        self.sent_at = {}           # (code, key) -> monotonic time the event was sent
+        self.latencies = []
+        self.rest_latencies = []
+        self.messages = 0
+        self.events = 0
+
+    async def send(self, code, socket, message, *keys):
+        now = time.monotonic()
+        for key in keys:
+            self.sent_at[(code, key)] = now
+        self.events += 1
+        await socket.send(message)
+
+    def received(self, code, message):
+        now = time.monotonic()
+        self.messages += 1
+        for key in message_keys(message):
+            sent_at = self.sent_at.get((code, key))
+            if sent_at is not None:
+                self.latencies.append(now - sent_at)
+
+    async def request(self, method, path, token, **kwargs):
+        headers = kwargs.pop('headers', {})
+        headers['Authorization'] = f'Token {token}'
+        started = time.monotonic()
+        response = await self.http.request(method, path, headers=headers, **kwargs)
+        self.rest_latencies.append(time.monotonic() - started)
+        self.events += 1
+        if response.status_code >= 400:
+            raise CommandError(f'{method} {path} failed with {response.status_code}: {response.text[:200]}')
+        return response
+
+
+class SimulatedPlayer:
+    def __init__(self, run, code, user_id, username, token, is_host, seats):
+        self.run = run
+        self.code = code
+        self.user_id = user_id
+        self.username = username
+        self.token = token
+        self.is_host = is_host
+        self.seats = seats
+        self.socket = None
+        self.etag = None
+        self.ready = set()
+        self.answered = set()
+        self.question = None
+        self._answering = None
+
+    async def join(self):
+        if not self.is_host:
+            await self.run.request('POST', '/api/game/join/', self.token, json={'game_code': self.code})
+        self.socket = await self.run.connect(self.code, self.token)
+        # Initial game state
+        self.run.received(self.code, await self.socket.receive(self.run.timeout))
+
+    async def play(self):
+        await self.run.send(
+            self.code, self.socket,
+            {'type': 'player_ready', 'user_id': self.user_id, 'is_ready': True},
+            ('ready', self.username),
+        )
+        while True:
+            message = await self.socket.receive(self.run.timeout)
+            self.run.received(self.code, message)
+            if message.get('type') == 'game_started':
+                await self.open_question(0)
+            for op in message.get('ops', ()):
+                if op['op'] == 'ready' and op['is_ready']:
+                    self.ready.add(op['username'])
+                elif op['op'] == 'answered':
+                    self.answered.add(op['username'])
+                elif op['op'] == 'question':
+                    if op['status'] != 'in_progress':
+                        await self.finish()
+                        return
+                    await self.open_question(op['current_question'])
+            await self.host_turn()
+
+    async def host_turn(self):
+        if not self.is_host:
+            return
+        if self.question is None and len(self.ready) == self.seats:
+            self.question = -1
+            await self.run.send(
+                self.code, self.socket, {'type': 'start_game', 'username': self.username},
+                ('question', 0),
+            )
+        elif self.question is not None and self.question >= 0 and len(self.answered) == self.seats:
+            # Everyone answered: reveal and move on without waiting for the deadline
+            self.answered.clear()
+            question, self.question = self.question, -1
+            await self.run.send(
+                self.code, self.socket, {'type': 'next_question', 'username': self.username},
+                ('closed', question), ('question', question + 1),
+            )
+
+    async def open_question(self, question):
+        self.question = question
+        self.answered.clear()
+        self._answering = asyncio.ensure_future(self.answer(question))
+        await self.refresh_status()
+
+    async def answer(self, question):
+        await asyncio.sleep(random.uniform(0, self.run.think))
+        if self.question == question:
+            await self.run.send(
+                self.code, self.socket,
+                {'type': 'submit_answer', 'username': self.username, 'answer': random.randrange(4)},
+                ('answered', self.username),
+            )
+
+    async def refresh_status(self):
+        headers = {'If-None-Match': self.etag} if self.etag else {}
+        response = await self.run.request(
+            'GET', f'/api/game/{self.code}/status/', self.token, headers=headers,
+        )
+        self.etag = response.headers.get('ETag', self.etag)
+
+    async def finish(self):
+        if self._answering is not None:
+            self._answering.cancel()
+        await self.socket.close()
+
+
+async def run_all(coroutines):
+    """Run ``coroutines`` together; if one fails, cancel the rest."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class Command(BaseCommand):
+    help = (
+        'Play N rooms of M simulated players through a whole game over the '
+        'WebSocket and REST endpoints and report broadcast latency, messages/s, '
+        'DB queries per event and memory per connection.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=10, help='Number of rooms')
+        parser.add_argument('--players', type=int, default=10, help='Players per room, host included')
+        parser.add_argument('--questions', type=int, default=5, help='Questions per game')
+        parser.add_argument('--time-limit', type=int, default=30, help='Seconds per question')
+        parser.add_argument('--think', type=float, default=1.0, help='Most seconds a player takes to answer')
+        parser.add_argument('--timeout', type=float, default=60.0, help='Seconds to wait for any one message')
+        parser.add_argument(
+            '--url', default='',
+            help='Base URL of a running server (e.g. http://127.0.0.1:8000); '
+                 'by default the ASGI application is run in this process',
+        )
+        parser.add_argument('--server-pid', type=int, help='PID of the --url server, to measure its memory')
+        parser.add_argument('--keep', action='store_true', help='Keep the load test users and games')
+
+    def handle(self, *args, **options):
+        rooms, seats = options['rooms'], options['players']
+        if rooms < 1 or seats < 1:
+            raise CommandError('--rooms and --players must be at least 1')
+
+        quiz = make_quiz(options['questions'], options['time_limit'])
+        games = create_rooms(rooms, seats, quiz)
+        try:
+            report = asyncio.run(self.run(games, options))
+        except asyncio.TimeoutError:
+            raise CommandError(
+                f"A client got no message for {options['timeout']}s; the server is "
+                f"overloaded at this size (or dropped messages)."
+            )
+        finally:
+            if not options['keep']:
+                close_old_connections()
+                remove_load_users()
+        self.write_report(report, rooms, seats)
+
+    async def run(self, games, options):
+        url = options['url'].rstrip('/')
+        timeout = options['timeout']
+        worker = None
+        counter = None
+
+        if url:
+            ws_url = 'ws' + url[len('http'):] if url.startswith('http') else url
+            http = httpx.AsyncClient(base_url=url, timeout=timeout)
+
+            async def connect(code, token):
+                return await NetworkSocket.connect(f'{ws_url}/ws/game/{code}/?token={token}', timeout)
+
+            pid = options['server_pid']
+        else:
+            from backend.asgi import application
+
+            http = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=application), base_url='http://localhost', timeout=timeout,
+            )
+
+            async def connect(code, token):
+                return await InProcessSocket.connect(application, f'/ws/game/{code}/?token={token}', timeout)
+
+            pid = os.getpid()
+            counter = QueryCounter()
+            await sync_to_async(counter.start)()
+            if engine_shards():
+                # The rooms' engines run here too
+                worker = Worker(
+                    application=application, channels=list(engine_channels), channel_layer=get_channel_layer(),
+                )
+                worker_task = asyncio.ensure_future(worker.run())
+
+        run = LoadRun(http, connect, timeout, options['think'])
+        players = [
+            SimulatedPlayer(run, code, user_id, username, token, seat == 0, len(seated))
+            for code, seated in games
+            for seat, (user_id, username, token) in enumerate(seated)
+        ]
+        try:
+            rss_before = rss_bytes(pid) if pid else None
+            semaphore = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+            async def join(player):
+                async with semaphore:
+                    await player.join()
+
+            await run_all(join(player) for player in players)
+            rss_after = rss_bytes(pid) if pid else None
+
+            # Only the game itself is timed
+            run.latencies.clear()
+            run.rest_latencies.clear()
+            run.messages = run.events = 0
+            queries_before = counter.count if counter else 0
+            started = time.monotonic()
+            await run_all(player.play() for player in players)
+            elapsed = time.monotonic() - started
+        finally:
+            if counter is not None:
+                counter.stop()
+            if worker is not None:
+                worker_task.cancel()
+            await http.aclose()
+
+        memory = None
+        if rss_before is not None and rss_after is not None:
+            memory = (rss_after - rss_before) / len(players)
+        return {
+            'connections': len(players),
+            'elapsed': elapsed,
+            'messages': run.messages,
+            'events': run.events,
+            'latencies': run.latencies,
+            'rest_latencies': run.rest_latencies,
+            'queries': counter.count - queries_before if counter else None,
+            'memory': memory,
+        }
+
+    def write_report(self, report, rooms, seats):
+        elapsed = report['elapsed']
+        self.stdout.write(
+            f"{'rooms':>6} {'players':>8} {'sockets':>8} {'events':>8} {'messages':>9} "
+            f"{'seconds':>8} {'msgs/s':>9}"
+        )
+        self.stdout.write(
+            f"{rooms:>6} {seats:>8} {report['connections']:>8} {report['events']:>8} "
+            f"{report['messages']:>9} {elapsed:>8.2f} {report['messages'] / elapsed:>9.0f}"
+        )
+        self.stdout.write('')
+        self.stdout.write(f"{'latency':<10} {'samples':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for label, values in (('broadcast', report['latencies']), ('rest', report['rest_latencies'])):
+            self.stdout.write(
+                f"{label:<10} {len(values):>8} "
+                f"{percentile(values, 50) * 1000:>9.2f} "
+                f"{percentile(values, 95) * 1000:>9.2f} "
+                f"{percentile(values, 99) * 1000:>9.2f}"
+            )
+        self.stdout.write('')
+        if report['queries'] is None:
+            self.stdout.write('DB queries per event: n/a (counted in-process only)')
+        else:
+            self.stdout.write(
+                f"DB queries per event: {report['queries'] / max(report['events'], 1):.2f} "
+                f"({report['queries']} queries)"
+            )
+        if report['memory'] is None:
+            self.stdout.write('Memory per connection: n/a (pass --server-pid)')
+        else:
+            self.stdout.write(f"Memory per connection: {report['memory'] / 1024:.1f} KiB")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from base.service.statsService import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the PlayerStats table from the players of every completed game.'
+
+    def handle(self, *args, **options):
+        count = rebuild_stats()
+        self.stdout.write(f'Rebuilt stats for {count} user(s)')
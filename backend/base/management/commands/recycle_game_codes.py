@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from base.service.gameCodes import DEFAULT_RECYCLE_AFTER, recycle_codes
+
+
+class Command(BaseCommand):
+    help = 'Make the codes of rooms that completed long enough ago available to new rooms.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--after', type=int,
+            default=getattr(settings, 'GAME_CODE_RECYCLE_AFTER', DEFAULT_RECYCLE_AFTER),
+            help='Seconds since a room completed before its code is recycled',
+        )
+
+    def handle(self, *args, **options):
+        count = recycle_codes(timezone.now() - timedelta(seconds=options['after']))
+        self.stdout.write(f'Recycled {count} game code(s)')
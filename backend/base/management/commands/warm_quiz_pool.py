@@ -0,0 +1,17 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from base.service.quizGenerator import DEFAULT_MODEL
+from base.service.quizPool import pool_level, pool_questions, warm_pool
+
+
+class Command(BaseCommand):
+    help = 'Generate quizzes until the pool of every pair in QUIZ_POOL_TOPICS is full.'
+
+    def handle(self, *args, **options):
+        asyncio.run(warm_pool())
+        for topic, difficulty in settings.QUIZ_POOL_TOPICS:
+            level = pool_level(topic, difficulty, pool_questions(), DEFAULT_MODEL)
+            self.stdout.write(f'{topic} / {difficulty}: {level} quiz(zes) ready')
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 16:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0007_chatmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['game_room', 'id'], name='chat_room_id_idx'),
+        ),
+    ]
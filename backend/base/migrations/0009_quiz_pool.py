@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-17 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0008_chatmessage_room_id_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='question',
+            options={'ordering': ['id']},
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='explanation',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='model',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='title',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['topic', 'difficulty_level', 'num_questions', 'model'], name='quiz_pool_idx'),
+        ),
+    ]
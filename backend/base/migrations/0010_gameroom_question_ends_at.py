@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0009_quiz_pool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameroom',
+            name='question_ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
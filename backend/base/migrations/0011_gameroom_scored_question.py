@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0010_gameroom_question_ends_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameroom',
+            name='scored_question',
+            field=models.IntegerField(default=-1),
+        ),
+    ]
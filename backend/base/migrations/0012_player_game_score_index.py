@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0011_gameroom_scored_question'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['game', '-score'], name='player_game_score_idx'),
+        ),
+    ]
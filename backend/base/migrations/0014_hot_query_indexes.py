@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0013_player_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['game_room', 'timestamp'], name='chat_room_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gameroom',
+            index=models.Index(fields=['status', 'created_at'], name='game_status_created_idx'),
+        ),
+    ]
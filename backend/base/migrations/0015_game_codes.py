@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0014_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameCodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecycledGameCode',
+            fields=[
+                ('code', models.CharField(max_length=6, primary_key=True, serialize=False)),
+                ('released_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='gameroom',
+            name='code',
+            field=models.CharField(default='', max_length=16, unique=True),
+        ),
+    ]
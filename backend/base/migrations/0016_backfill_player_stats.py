@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from base.service.statsService import rebuild_stats
+
+
+def backfill_player_stats(apps, schema_editor):
+    # Profiles and the global leaderboard only read PlayerStats: count the
+    # games completed before it existed, and mark them as recorded
+    rebuild_stats(
+        apps.get_model('base', 'GameRoom'),
+        apps.get_model('base', 'Player'),
+        apps.get_model('base', 'PlayerStats'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0015_game_codes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_player_stats, migrations.RunPython.noop),
+    ]
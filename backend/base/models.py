@@ -1,6 +1,5 @@
 from django.db import models
 from django.contrib.auth.models import User
-import uuid
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -18,9 +17,18 @@ class UserProfile(models.Model):
         return f"{self.user.username}'s Profile"
 
 class Quiz(models.Model):
-    topic = models.CharField(max_length=255)
+    # Pre-generated quizzes waiting in the pool (see service/quizPool.py)
+    topic = models.CharField(max_length=255)  # normalized: stripped, lowercase
     num_questions = models.IntegerField()
     difficulty_level = models.CharField(max_length=10) # easy, medium, hard
+    model = models.CharField(max_length=100, default='')
+    title = models.CharField(max_length=255, default='')
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['topic', 'difficulty_level', 'num_questions', 'model'], name='quiz_pool_idx'),
+        ]
 
     def __str__(self):
         return f"{self.topic} - {self.num_questions} questions"
@@ -29,7 +37,11 @@ class Question(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
     question_text = models.TextField()
     options = models.JSONField() # list of options
-    correct_answer = models.CharField(max_length=255)
+    correct_answer = models.CharField(max_length=255)  # option letter, A-D
+    explanation = models.TextField(blank=True, default='')
+
+    class Meta:
+        ordering = ['id']
 
     def __str__(self):
         return self.question_text
@@ -42,7 +54,8 @@ class GameRoom(models.Model):
         ('completed', 'Completed'),
     ]
     
-    code = models.CharField(max_length=6, unique=True, default='')
+    # Six characters while the room is live; "<code>-<id>" once recycled
+    code = models.CharField(max_length=16, unique=True, default='')
     host = models.ForeignKey(User, on_delete=models.CASCADE, related_name='hosted_games')
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
@@ -50,23 +63,38 @@ class GameRoom(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
     max_players = models.IntegerField(default=10)
     current_question = models.IntegerField(default=0)
+    question_ends_at = models.DateTimeField(null=True, blank=True)  # Answering closes at
+    scored_question = models.IntegerField(default=-1)  # Last question whose answers were scored
+    stats_recorded = models.BooleanField(default=False)  # Added to PlayerStats once completed
     quiz_data = models.JSONField(default=dict)  # Store the quiz questions
 
+    class Meta:
+        indexes = [
+            # Lobby / maintenance: filter(status=...).order_by('-created_at')
+            models.Index(fields=['status', 'created_at'], name='game_status_created_idx'),
+        ]
+
     def __str__(self):
         return f"Game {self.code} by {self.host.username}"
     
     def save(self, *args, **kwargs):
         if not self.code:
-            # Generate a unique 6-character game code
-            self.code = self.generate_unique_code()
+            # Issued from this process's reserved block, without a lookup
+            from .service.gameCodes import allocate_code
+            self.code = allocate_code()
         super().save(*args, **kwargs)
-    
-    @staticmethod
-    def generate_unique_code():
-        code = str(uuid.uuid4())[:6].upper()
-        while GameRoom.objects.filter(code=code).exists():
-            code = str(uuid.uuid4())[:6].upper()
-        return code
+
+
+class GameCodeSequence(models.Model):
+    """Next counter value the game code allocator has not handed out (one row)."""
+    next_value = models.BigIntegerField(default=0)
+
+
+class RecycledGameCode(models.Model):
+    """Code of a long-finished room, free to be issued again."""
+    code = models.CharField(max_length=6, primary_key=True)
+    released_at = models.DateTimeField(auto_now_add=True)
+
 
 class Player(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -84,25 +112,34 @@ class Player(models.Model):
 
     class Meta:
         unique_together = ['user', 'game']
+        indexes = [
+            # Room leaderboard: filter(game=...).order_by('-score')
+            models.Index(fields=['game', '-score'], name='player_game_score_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} in game {self.game.code}"
 
-    def update_stats(self, is_correct, answer_time):
-        """Update player statistics based on answer"""
-        self.total_questions += 1
-        if is_correct:
-            self.correct_answers += 1
-            self.current_streak += 1
-            self.best_streak = max(self.best_streak, self.current_streak)
-        else:
-            self.current_streak = 0
-        
-        # Update average time
-        if self.total_questions > 0:
-            self.average_time = ((self.average_time * (self.total_questions - 1)) + answer_time) / self.total_questions
-        
-        self.save()
+
+class PlayerStats(models.Model):
+    """A user's totals over every completed game, kept up to date as games end."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stats')
+    games_played = models.IntegerField(default=0)
+    total_score = models.IntegerField(default=0)
+    total_questions = models.IntegerField(default=0)
+    correct_answers = models.IntegerField(default=0)
+    best_streak = models.IntegerField(default=0)
+    total_time = models.FloatField(default=0.0)  # Seconds spent answering, over all questions
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def average_time(self):
+        return self.total_time / self.total_questions if self.total_questions else 0.0
+
+    def __str__(self):
+        return f"Stats of {self.user.username}"
+
+
 class ChatMessage(models.Model):
     game_room = models.ForeignKey(GameRoom, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -111,6 +148,12 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Cursor pagination: filter(game_room=...).filter(id__gt=since_id)
+            models.Index(fields=['game_room', 'id'], name='chat_room_id_idx'),
+            # History in the default ordering: filter(game_room=...).order_by('timestamp')
+            models.Index(fields=['game_room', 'timestamp'], name='chat_room_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sender.username}: {self.message[:50]}"
\ No newline at end of file
@@ -1,6 +1,17 @@
+from django.conf import settings
 from django.urls import re_path
 from . import consumers
  
 websocket_urlpatterns = [
     re_path(r'ws/game/(?P<game_code>\w+)/$', consumers.GameConsumer.as_asgi()),
-] 
\ No newline at end of file
+]
+
+# Engine channels served by `manage.py runworker game-engine-<n>`
+engine_channels = {
+    f'game-engine-{shard}': consumers.RoomEngineConsumer.as_asgi()
+    for shard in range(settings.GAME_ENGINE_SHARDS)
+}
+
+# Quiz pool refills, served by `manage.py runworker <QUIZ_POOL_CHANNEL>`
+if settings.QUIZ_POOL_CHANNEL:
+    engine_channels[settings.QUIZ_POOL_CHANNEL] = consumers.QuizPoolConsumer.as_asgi()
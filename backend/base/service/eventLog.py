@@ -0,0 +1,109 @@
+"""
+Structured, level-gated logging for the game hot paths.
+
+``log_event(logger, 'answer.submitted', player=..., score=...)`` emits one
+record whose fields are rendered as a JSON line. The disabled case costs a
+single ``isEnabledFor`` check, so per-answer and per-socket events stay at
+DEBUG and are free in production. Enabled events can be sampled: with
+``sample=0.01`` only about one call in a hundred produces a record.
+``traced`` does the same for the duration of a block.
+
+Records are handed to a queue and formatted and written by a background
+thread (``QueuedStreamHandler``), so logging never blocks the event loop
+on stdout. Settings: GAME_LOG_LEVEL and GAME_LOG_SAMPLE_RATE.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+DEFAULT_SAMPLE_RATE = 0.01
+
+
+def get_logger(name):
+    return logging.getLogger(f'mindclash.{name}')
+
+
+def sample_rate():
+    from django.conf import settings
+    return getattr(settings, 'GAME_LOG_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+
+
+def log_event(logger, event, level=logging.DEBUG, sample=None, exc_info=False, **fields):
+    """
+    Log ``event`` with structured ``fields`` if ``level`` is enabled.
+
+    ``sample`` is the fraction of calls to keep; pass ``True`` to use
+    GAME_LOG_SAMPLE_RATE. Unsampled events are always logged.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if sample is True:
+        sample = sample_rate()
+    if sample is not None and random.random() >= sample:
+        return
+    logger.log(level, event, exc_info=exc_info, extra={'event': event, 'fields': fields})
+
+
+@contextmanager
+def traced(logger, event, level=logging.DEBUG, sample=True, **fields):
+    """Log how long the ``with`` block took, as ``event`` with ``duration_ms``."""
+    if not logger.isEnabledFor(level):
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        log_event(
+            logger, event, level, sample,
+            duration_ms=round((time.perf_counter() - start) * 1000, 3), **fields
+        )
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, event and its fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': getattr(record, 'event', record.getMessage()),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class QueuedStreamHandler(QueueHandler):
+    """
+    Handler that only enqueues records; a listener thread formats them and
+    writes them to ``stream`` (stderr by default).
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream)
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        return record
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        self.target.close()
+        super().close()
@@ -0,0 +1,142 @@
+"""
+Game codes.
+
+A code is six characters of a 32-letter alphabet without look-alikes
+(no 0/O or 1/I), so there are 2**30 of them. Code number ``n`` is the image
+of ``n`` under a fixed permutation of ``[0, 2**30)`` (rounds of multiplying
+by an odd constant, an xor-shift and an xor, each invertible), so
+consecutive rooms get unrelated-looking codes while two counter values can
+never share one.
+
+Each process reserves GAME_CODE_BLOCK counter values at a time from the
+GameCodeSequence row (one locked read-modify-write per block) and hands them
+out from memory: creating a room looks nothing up, and no two processes are
+ever given the same value. A block is checked once against codes already in
+use (rooms created before this allocator).
+
+Codes are recycled: ``recycle_codes`` (``manage.py recycle_game_codes``)
+renames rooms that completed more than GAME_CODE_RECYCLE_AFTER seconds ago
+to ``<code>-<id>`` and puts their code in the RecycledGameCode pool, which
+the next blocks are taken from first. Changing the constants below reissues
+codes already given out.
+"""
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Cast, Concat
+
+from ..models import GameCodeSequence, GameRoom, RecycledGameCode
+from .roomEngine import invalidate_room
+
+ALPHABET = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH    # 2**30
+
+_MASK = CODE_SPACE - 1
+# Odd, so multiplying by them is invertible modulo 2**30
+_MULTIPLIERS = (0x2545F491, 0x1B873593, 0x3C6EF373)
+_KEY = 0x15A4E35
+
+DEFAULT_BLOCK = 100
+DEFAULT_RECYCLE_AFTER = 7 * 24 * 60 * 60
+# Rooms renamed per UPDATE when recycling
+RECYCLE_BATCH = 500
+
+
+def permute(value):
+    """Bijection of ``[0, CODE_SPACE)`` onto itself."""
+    for multiplier in _MULTIPLIERS:
+        value = (value * multiplier) & _MASK
+        value ^= value >> 15
+        value ^= _KEY
+    return value
+
+
+def encode(value):
+    """The code of ``value`` (in ``[0, CODE_SPACE)``)."""
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def reserve_block(size):
+    """
+    Up to ``size`` codes no one else will be given: recycled codes first,
+    then fresh counter values.
+    """
+    with transaction.atomic():
+        codes = list(
+            RecycledGameCode.objects.select_for_update(skip_locked=True)
+            .order_by('released_at').values_list('code', flat=True)[:size]
+        )
+        if codes:
+            RecycledGameCode.objects.filter(code__in=codes).delete()
+
+        fresh = size - len(codes)
+        if fresh:
+            sequence, _ = GameCodeSequence.objects.select_for_update().get_or_create(pk=1)
+            start = sequence.next_value
+            if start + fresh > CODE_SPACE:
+                raise RuntimeError('Every game code has been issued; recycle some with recycle_game_codes')
+            GameCodeSequence.objects.filter(pk=1).update(next_value=F('next_value') + fresh)
+            codes.extend(encode(permute(value)) for value in range(start, start + fresh))
+
+    # Skip codes of rooms created before this allocator
+    taken = set(GameRoom.objects.filter(code__in=codes).values_list('code', flat=True))
+    return [code for code in codes if code not in taken]
+
+
+class CodeAllocator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes = deque()
+
+    def allocate(self):
+        with self._lock:
+            while not self._codes:
+                self._codes.extend(reserve_block(getattr(settings, 'GAME_CODE_BLOCK', DEFAULT_BLOCK)))
+            return self._codes.popleft()
+
+    def reset(self):
+        """Forget the reserved codes (tests)."""
+        with self._lock:
+            self._codes.clear()
+
+
+code_allocator = CodeAllocator()
+
+
+def allocate_code():
+    return code_allocator.allocate()
+
+
+def recycle_codes(ended_before):
+    """
+    Release the codes of rooms completed before ``ended_before``.
+
+    Returns the number of codes released.
+    """
+    rooms = list(
+        GameRoom.objects.filter(status='completed', ended_at__lt=ended_before)
+        .exclude(code__contains='-')
+        .values_list('pk', 'code')
+    )
+    for start in range(0, len(rooms), RECYCLE_BATCH):
+        batch = rooms[start:start + RECYCLE_BATCH]
+        with transaction.atomic():
+            # "<code>-<id>" is never a live code, and is unique as ids are
+            GameRoom.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                code=Concat('code', Value('-'), Cast('id', CharField()), output_field=CharField()),
+            )
+            RecycledGameCode.objects.bulk_create(
+                [RecycledGameCode(code=code) for _, code in batch], ignore_conflicts=True,
+            )
+        for _, code in batch:
+            # Nothing cached under the code may outlive its room
+            invalidate_room(code)
+    return len(rooms)
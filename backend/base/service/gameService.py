@@ -2,10 +2,44 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
+from datetime import timedelta
 from ..models import GameRoom, Player, Quiz, Question
+from .roomEngine import invalidate_room, schedule_question, submit_answer as submit_room_answer
+from .quizService import get_compiled_quiz, normalize_quiz, questions_pending
+from .leaderboardService import room_leaderboard, standings
+from .scoringService import reveal_question
+from .statsService import record_game
+from .statusCache import current_etag
+from .eventLog import get_logger, log_event
 import uuid
 import random
 import json
+import logging
+
+logger = get_logger('game')
+
+def open_game(host, quiz_data):
+    """
+    Create a game room hosted by ``host`` and seat the host in it.
+    """
+    # Every question's correct option is resolved up front
+    game = GameRoom.objects.create(
+        host=host,
+        quiz_data=normalize_quiz(quiz_data)
+    )
+    
+    # Add the host as a player
+    Player.objects.create(
+        user=host,
+        game=game,
+        is_ready=True  # Host is automatically ready
+    )
+    return game
+
+def question_deadline(game, opened_at):
+    """When answering closes for a question of ``game`` opened at ``opened_at``."""
+    quiz = get_compiled_quiz(game.pk, game.quiz_data)
+    return opened_at + timedelta(seconds=quiz.time_per_question)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -19,18 +53,7 @@ def create_game(request):
         if not quiz_data:
             return Response({'error': 'Quiz data is required'}, status=400)
         
-        # Create a new game
-        game = GameRoom.objects.create(
-            host=request.user,
-            quiz_data=quiz_data
-        )
-        
-        # Add the host as a player
-        Player.objects.create(
-            user=request.user,
-            game=game,
-            is_ready=True  # Host is automatically ready
-        )
+        game = open_game(request.user, quiz_data)
         
         return Response({
             'success': True,
@@ -77,6 +100,7 @@ def join_game(request):
             user=request.user,
             game=game
         )
+        invalidate_room(game.code)
         
         return Response({
             'success': True,
@@ -94,7 +118,14 @@ def join_game(request):
 def get_game_status(request, game_code):
     """
     Get the current status of a game room, including player stats.
+
+    Responses carry an ETag; a request whose If-None-Match still matches is
+    answered with 304 from the cache without reading the game.
     """
+    etag = current_etag(game_code)
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+
     try:
         game = GameRoom.objects.get(code=game_code)
         players = Player.objects.filter(game=game).select_related('user')
@@ -132,13 +163,14 @@ def get_game_status(request, game_code):
                 'status': game.status,
                 'host': game.host.username,
                 'current_question': game.current_question,
+                'question_ends_at': game.question_ends_at,
                 'current_question_data': current_question_data,
                 'players': player_data,
                 'created_at': game.created_at,
                 'started_at': game.started_at,
                 'ended_at': game.ended_at
             }
-        })
+        }, headers={'ETag': etag})
 
     except GameRoom.DoesNotExist:
         return Response({
@@ -168,10 +200,13 @@ def start_game(request, game_code):
         if game.status != 'waiting':
             return Response({'error': 'Game has already started or ended'}, status=400)
         
-        # Start the game
+        # Start the game; the server closes the first question at its deadline
         game.status = 'in_progress'
         game.started_at = timezone.now()
+        game.question_ends_at = question_deadline(game, game.started_at)
         game.save()
+        invalidate_room(game.code)
+        schedule_question(game.code)
         
         return Response({
             'success': True,
@@ -194,123 +229,78 @@ def submit_answer(request, game_code):
         answer = request.data.get('answer')
         answer_time = request.data.get('answer_time')
         
-        print(f"[BACKEND] Received answer submission: answer={answer}, answer_time={answer_time}")
+        log_event(logger, 'answer.received', sample=True, game=game_code, answer=answer, answer_time=answer_time)
         
-        if answer is None or answer_time is None:
-            error_msg = 'Answer and answer time are required'
-            print(f"[BACKEND] {error_msg}")
+        if answer is None:
+            error_msg = 'Answer is required'
+            log_event(logger, 'answer.rejected', game=game_code, reason=error_msg)
             return Response({'error': error_msg}, status=400)
         
         # Find the game
         try:
             game = GameRoom.objects.get(code=game_code)
-            print(f"[BACKEND] Found game: {game_code}, status={game.status}, current_question={game.current_question}")
         except GameRoom.DoesNotExist:
             error_msg = f'Game not found: {game_code}'
-            print(f"[BACKEND] {error_msg}")
+            log_event(logger, 'answer.rejected', game=game_code, reason=error_msg)
             return Response({'error': error_msg}, status=404)
         
         # Check if the game is in progress
         if game.status != 'in_progress':
             error_msg = f'Game is not in progress. Current status: {game.status}'
-            print(f"[BACKEND] {error_msg}")
+            log_event(logger, 'answer.rejected', game=game_code, reason=error_msg)
             return Response({'error': error_msg}, status=400)
         
-        # Get or create player
-        player, created = Player.objects.get_or_create(
-            user=request.user,
-            game=game,
-            defaults={'score': 0}
-        )
-        
-        print(f"[BACKEND] Player {request.user.username} (existing: {not created}) - current score: {player.score}")
+        if game.question_ends_at is not None and timezone.now() >= game.question_ends_at:
+            error_msg = 'Answering is closed for this question'
+            log_event(logger, 'answer.rejected', game=game_code, reason=error_msg)
+            return Response({'error': error_msg}, status=400)
         
-        # Check if player has already answered
-        if player.current_answer is not None:
-            print(f"[BACKEND] Player {request.user.username} has already answered: {player.current_answer}")
-            return Response({
-                'success': True,
-                'message': 'You have already submitted an answer',
-                'score': player.score,
-                'correct': player.current_answer == answer
-            })
-        
-        # Record the answer
-        player.current_answer = answer
-        
-        try:
-            # Get current question data with error handling
-            questions = game.quiz_data.get('questions', [])
-            if not questions:
-                raise IndexError("No questions in quiz data")
-            
-            if game.current_question >= len(questions):
-                raise IndexError("Current question index out of range")
-                
-            current_question = questions[game.current_question]
-            
-            # Check for both 'correct_answer' and 'correctAnswer' (case-sensitive)
-            if 'correct_answer' not in current_question:
-                # Check for 'correctAnswer' (capital A) which comes from the AI generator
-                if 'correctAnswer' in current_question:
-                    # Convert letter answer (A, B, C, D) to index (0, 1, 2, 3)
-                    correct_letter = current_question['correctAnswer'].upper()
-                    if correct_letter in ['A', 'B', 'C', 'D']:
-                        current_question['correct_answer'] = ord(correct_letter) - ord('A')
-                # Check for 'correct' (alternative format)
-                elif 'correct' in current_question:
-                    current_question['correct_answer'] = current_question['correct']
-                # Try to find correct answer in options if not directly available
-                elif 'options' in current_question and isinstance(current_question['options'], list):
-                    for i, option in enumerate(current_question['options']):
-                        if isinstance(option, dict) and option.get('isCorrect', False):
-                            current_question['correct_answer'] = i
-                            break
-            
-            # If still no correct_answer, default to 0 (first option)
-            if 'correct_answer' not in current_question:
-                current_question['correct_answer'] = 0
-            
-            correct_answer = current_question['correct_answer']
-            is_correct = answer == correct_answer
-            
-            # Update score if correct
-            if is_correct:
-                max_time = game.quiz_data.get('timePerQuestion', 30)
-                time_factor = max(0, 1 - (float(answer_time) / max_time))
-                points = int(1000 * time_factor)
-                player.score += points
-        
-        except (IndexError, KeyError) as e:
+        quiz = get_compiled_quiz(game.pk, game.quiz_data)
+        question = quiz.question(game.current_question)
+        if question is None:
             return Response({
                 'success': False,
                 'error': 'Error processing question data',
-                'details': str(e)
+                'details': 'Current question index out of range'
             }, status=500)
-        print(f"[BACKEND] Stats updated: correct={player.correct_answers}, streak={player.current_streak}")
 
-        player.update_stats(is_correct, float(answer_time))
-        print(f"[BACKEND] Stats updated: correct={player.correct_answers}, streak={player.current_streak}")
+        if not quiz.is_valid_answer(game.current_question, answer):
+            error_msg = f'Answer must be an option index between 0 and {len(question.options) - 1}'
+            log_event(logger, 'answer.rejected', game=game_code, reason=error_msg)
+            return Response({'error': error_msg}, status=400)
 
-            
-        # Save player and game states
-        player.save()
-        game.save()
-        print(player)
+        # Recorded by the room that owns the game, which broadcasts it to the
+        # group as a patch and measures its latency; whether it was right is
+        # only told to everyone at once, in the question_closed reveal
+        players = Player.objects.filter(user=request.user, game=game)
+        if submit_room_answer(game.code, request.user.id, answer, answer_time) is False:
+            # The room joined the player if needed, so the row exists
+            player = players.get()
+            log_event(
+                logger, 'answer.duplicate', game=game_code,
+                player=request.user.username, answer=player.current_answer
+            )
+            return Response({
+                'success': True,
+                'message': 'You have already submitted an answer',
+                'score': player.score
+            })
+
+        # An engine shard may still be joining the player
+        score = players.values_list('score', flat=True).first() or 0
+        log_event(
+            logger, 'answer.recorded', sample=True, game=game_code,
+            player=request.user.username
+        )
         
         return Response({
             'success': True,
             'message': 'Answer submitted successfully',
-            'is_correct': is_correct,
-            'score': player.score,
-            'correct_answer': correct_answer
+            'score': score
         }, status=200)
             
     except Exception as e:
-        error_msg = f'Error in submit_answer: {str(e)}'
-        print(f"[BACKEND] {error_msg}")
-        import traceback
-        traceback.print_exc()
+        log_event(logger, 'answer.failed', logging.ERROR, exc_info=True, game=game_code)
         return Response({
             'error': str(e)
         }, status=500)
@@ -336,6 +326,12 @@ def next_question(request, game_code):
         if game.status != 'in_progress':
             return Response({'error': 'Game is not in progress'}, status=400)
         
+        if questions_pending(game.quiz_data, game.current_question + 1):
+            return Response({'error': 'The next question is still being generated'}, status=409)
+        
+        # Score the question in one pass unless its deadline already did
+        reveal_question(game, get_compiled_quiz(game.pk, game.quiz_data))
+        
         # Reset all player answers for the next question
         Player.objects.filter(game=game).update(current_answer=None, answer_time=None)
         
@@ -347,8 +343,16 @@ def next_question(request, game_code):
         if game.current_question >= total_questions:
             game.status = 'completed'
             game.ended_at = timezone.now()
+            game.question_ends_at = None
+        else:
+            game.question_ends_at = question_deadline(game, timezone.now())
         
-        game.save()
+        # scored_question is left alone: the engine may have claimed it meanwhile
+        game.save(update_fields=['current_question', 'status', 'ended_at', 'question_ends_at'])
+        if game.status == 'completed':
+            record_game(game.pk)
+        invalidate_room(game.code)
+        schedule_question(game.code)
         
         return Response({
             'success': True,
@@ -362,37 +366,41 @@ def next_question(request, game_code):
             'error': str(e)
         }, status=500)
 
+def leaderboard_limit(request):
+    """``?limit=`` of a leaderboard request, or None for everyone."""
+    try:
+        limit = int(request.query_params['limit'])
+    except (KeyError, ValueError):
+        return None
+    return limit if limit > 0 else None
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_leaderboard(request, game_code):
     """
-    Get the leaderboard for a game
+    Get the leaderboard for a game, best first (``?limit=K`` for the top K),
+    with the requesting player's own rank
     """
     try:
         # Find the game
         try:
-            game = GameRoom.objects.get(code=game_code)
+            game = GameRoom.objects.select_related('host').get(code=game_code)
         except GameRoom.DoesNotExist:
             return Response({'error': 'Game not found'}, status=404)
         
-        # Get players sorted by score
-        players = Player.objects.filter(game=game).select_related('user').order_by('-score')
-        
-        # Format player data
-        leaderboard = []
-        for player in players:
-            leaderboard.append({
-                'username': player.user.username,
-                'score': player.score,
-                'is_host': player.user == game.host
-            })
+        limit = leaderboard_limit(request)
+        top, me = standings(room_leaderboard(game), request.user.username, limit)
+        for entry in top:
+            entry['is_host'] = entry['username'] == game.host.username
         
         return Response({
             'success': True,
-            'leaderboard': leaderboard
+            'leaderboard': top,
+            'me': me
         }, status=200)
         
     except Exception as e:
         return Response({
             'error': str(e)
-        }, status=500) 
\ No newline at end of file
+        }, status=500)
+
@@ -0,0 +1,69 @@
+"""
+Shared async GROQ client.
+
+Quiz generation and chat await the model instead of holding a worker thread
+for the whole completion, so game traffic on the same process keeps flowing
+while hosts wait. One AsyncGroq client (and its connection pool) is reused
+per event loop; at most GROQ_MAX_CONCURRENCY completions are in flight per
+process and each is cut off after GROQ_TIMEOUT seconds.
+"""
+import asyncio
+
+from django.conf import settings
+from groq import APITimeoutError, AsyncGroq
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 30.0
+
+__all__ = ['APITimeoutError', 'chat_completion', 'get_client', 'stream_completion']
+
+# (loop, client, semaphore) of the event loop that last used the client
+_state = None
+
+
+def _make_client():
+    return AsyncGroq(
+        api_key=settings.GROQ_API_KEY,
+        timeout=getattr(settings, 'GROQ_TIMEOUT', DEFAULT_TIMEOUT),
+        max_retries=1,
+    )
+
+
+def _current():
+    global _state
+    loop = asyncio.get_running_loop()
+    if _state is None or _state[0] is not loop:
+        # httpx connections belong to the loop that opened them
+        _state = (
+            loop,
+            _make_client(),
+            asyncio.Semaphore(getattr(settings, 'GROQ_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY)),
+        )
+    return _state
+
+
+def get_client():
+    """The AsyncGroq client of the running event loop."""
+    return _current()[1]
+
+
+async def chat_completion(**kwargs):
+    """``client.chat.completions.create(**kwargs)``, bounded by the process semaphore."""
+    _, client, semaphore = _current()
+    async with semaphore:
+        return await client.chat.completions.create(**kwargs)
+
+
+async def stream_completion(**kwargs):
+    """
+    Yield the text of a streamed completion as it arrives.
+
+    The semaphore slot is held until the stream is exhausted or closed.
+    """
+    _, client, semaphore = _current()
+    async with semaphore:
+        stream = await client.chat.completions.create(stream=True, **kwargs)
+        async for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                yield text
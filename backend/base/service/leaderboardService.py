@@ -0,0 +1,144 @@
+"""
+Ranked leaderboards.
+
+A ``Leaderboard`` behaves like a sorted set: members are kept ordered by
+score (highest first, ties by name), so a member's rank is a binary search
+and the top K is a slice. Scores are updated in place as questions are
+scored instead of re-sorting every player on each read.
+
+Boards kept by this process:
+
+- One per room (``room_leaderboard``), rebuilt from the ``(game, -score)``
+  index when the room's status ETag has moved since it was built, i.e. when
+  its scores may have changed. The room engine keeps its own board on the
+  RoomState, updated as each question is scored.
+- One global board of every user's total score over completed games
+  (``global_leaderboard``), read from ``PlayerStats.total_score`` every
+  LEADERBOARD_TTL seconds and updated in place by the games completed in
+  this process (``add_points``).
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from ..models import Player, PlayerStats
+from .statusCache import current_etag
+
+DEFAULT_TTL = 60
+# Number of rooms whose board is kept in this process
+ROOM_BOARDS = 1024
+
+
+class Leaderboard:
+    def __init__(self, scores=()):
+        self._scores = dict(scores)
+        self._order = sorted((-score, member) for member, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._scores)
+
+    def __contains__(self, member):
+        return member in self._scores
+
+    def score(self, member):
+        return self._scores.get(member)
+
+    def set(self, member, score):
+        old = self._scores.get(member)
+        if old == score:
+            return
+        if old is not None:
+            del self._order[bisect_left(self._order, (-old, member))]
+        self._scores[member] = score
+        insort(self._order, (-score, member))
+
+    def incr(self, member, delta):
+        self.set(member, self._scores.get(member, 0) + delta)
+
+    def remove(self, member):
+        old = self._scores.pop(member, None)
+        if old is not None:
+            del self._order[bisect_left(self._order, (-old, member))]
+
+    def rank(self, member):
+        """1-based rank of ``member``, or None if it is not on the board."""
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        return bisect_left(self._order, (-score, member)) + 1
+
+    def top(self, limit=None, offset=0):
+        """Entries ``{'rank', 'username', 'score'}`` from best to worst."""
+        end = None if limit is None else offset + limit
+        return [
+            {'rank': rank, 'username': member, 'score': -score}
+            for rank, (score, member) in enumerate(self._order[offset:end], start=offset + 1)
+        ]
+
+    def entry(self, member):
+        """``member``'s own entry, or None."""
+        rank = self.rank(member)
+        if rank is None:
+            return None
+        return {'rank': rank, 'username': member, 'score': self._scores[member]}
+
+
+_lock = threading.Lock()
+_rooms = {}          # code -> (etag, Leaderboard)
+_global = None       # (loaded_at, Leaderboard)
+
+
+def room_leaderboard(game):
+    """Board of ``game``'s players, from this process's copy while it is current."""
+    etag = current_etag(game.code)
+    with _lock:
+        cached = _rooms.get(game.code)
+        if cached is not None and cached[0] == etag:
+            return cached[1]
+    board = Leaderboard(
+        Player.objects.filter(game=game).order_by('-score').values_list('user__username', 'score')
+    )
+    with _lock:
+        _rooms[game.code] = (etag, board)
+        if len(_rooms) > ROOM_BOARDS:
+            _rooms.pop(next(iter(_rooms)))
+    return board
+
+
+def global_leaderboard():
+    """Board of every user's total score over completed games."""
+    global _global
+    ttl = getattr(settings, 'LEADERBOARD_TTL', DEFAULT_TTL)
+    with _lock:
+        if _global is not None and time.monotonic() - _global[0] < ttl:
+            return _global[1]
+    board = Leaderboard(
+        PlayerStats.objects.values_list('user__username', 'total_score')
+    )
+    with _lock:
+        _global = (time.monotonic(), board)
+    return board
+
+
+def standings(board, member, limit=None):
+    """``(top entries, member's entry)`` of ``board``, read consistently."""
+    with _lock:
+        return board.top(limit), board.entry(member)
+
+
+def add_points(points):
+    """Add the ``(username, score)`` results of a game completed in this process to the global board."""
+    with _lock:
+        if _global is None:
+            return
+        for username, gained in points:
+            if gained:
+                _global[1].incr(username, gained)
+
+
+def clear_leaderboards():
+    global _global
+    with _lock:
+        _rooms.clear()
+        _global = None
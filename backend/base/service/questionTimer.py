@@ -0,0 +1,94 @@
+"""
+Server-side question deadlines.
+
+One ``QuestionTimer`` per process keeps the next deadline of every room it
+owns in a heap and runs a single task that sleeps until the earliest one, so
+thousands of rooms cost one sleeping task and a heap entry each. Arming a
+room again replaces its previous deadline (the old heap entry is skipped
+when it surfaces). Expired deadlines are handed to ``callback(code, key)`` in
+their own task, so one slow room never holds up the others.
+"""
+import asyncio
+import heapq
+import logging
+import time
+
+from .eventLog import get_logger, log_event
+
+logger = get_logger('timer')
+
+
+class QuestionTimer:
+    def __init__(self, callback):
+        self.callback = callback
+        self._heap = []
+        self._armed = {}        # code -> (when, key) of its live deadline
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+        self._running = set()   # strong references to callback tasks
+
+    def arm(self, code, key, when):
+        """
+        Call ``callback(code, key)`` at ``when`` (a ``time.time()`` value),
+        replacing any deadline already armed for ``code``.
+        """
+        if self._armed.get(code) == (when, key):
+            return
+        self._armed[code] = (when, key)
+        heapq.heappush(self._heap, (when, code, key))
+        self._ensure_running()
+        if self._heap[0][1] == code:
+            self._wakeup.set()
+
+    def cancel(self, code):
+        self._armed.pop(code, None)
+
+    def deadline(self, code):
+        """``(when, key)`` armed for ``code``, or None."""
+        return self._armed.get(code)
+
+    def clear(self):
+        self._heap.clear()
+        self._armed.clear()
+        if self._task is not None and not self._loop.is_closed():
+            self._task.cancel()
+        self._task = None
+
+    def __len__(self):
+        return len(self._armed)
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # The task and its event belong to the loop that started them
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while self._heap:
+            when, code, key = self._heap[0]
+            delay = when - time.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            if self._armed.get(code) != (when, key):
+                continue
+            del self._armed[code]
+            task = asyncio.ensure_future(self._fire(code, key))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _fire(self, code, key):
+        try:
+            await self.callback(code, key)
+        except Exception:
+            log_event(logger, 'timer.failed', logging.ERROR, exc_info=True, room=code, key=key)
@@ -0,0 +1,113 @@
+"""
+Cache of generated quizzes.
+
+Hosts ask for the same ``(topic, difficulty, count, model)`` over and over,
+and every generation is a slow LLM call. Generated quizzes are kept in an
+in-process LRU keyed by a hash of the normalized request, for
+QUIZ_CACHE_TTL seconds.
+
+Generations are single-flight: while one request is generating a quiz,
+identical requests await it and share its result instead of calling the
+model again. Failures are not cached; every waiter sees the exception.
+The cache is used from the event loop only, so it needs no locking.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+DEFAULT_TTL = 60 * 60
+DEFAULT_SIZE = 256
+
+
+def quiz_key(topic, difficulty, count, model):
+    """Content address of a generation request."""
+    parts = [str(topic).strip().lower(), str(difficulty).strip().lower(), int(count), str(model)]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+class QuizCache:
+    def __init__(self, ttl=None, size=None, clock=time.monotonic):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'QUIZ_CACHE_TTL', DEFAULT_TTL)
+        self.size = size if size is not None else getattr(settings, 'QUIZ_CACHE_SIZE', DEFAULT_SIZE)
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, quiz)
+        self._flights = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_generate(self, key, generate):
+        """
+        Return the cached quiz for ``key``, or await ``generate()`` to make it.
+
+        Returns ``(quiz, cached)``; ``cached`` is False only for the request
+        that actually ran ``generate``.
+        """
+        quiz = self._lookup(key)
+        if quiz is not None:
+            self.hits += 1
+            return quiz, True
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            # shield: a cancelled waiter must not cancel the shared generation
+            return await asyncio.shield(flight), True
+
+        self.misses += 1
+        flight = self._flights[key] = asyncio.ensure_future(generate())
+        try:
+            quiz = await asyncio.shield(flight)
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+        self.put(key, quiz)
+        return quiz, False
+
+    def get(self, key):
+        """The cached quiz for ``key`` or None, without generating one."""
+        quiz = self._lookup(key)
+        if quiz is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return quiz
+
+    def put(self, key, quiz):
+        self._entries[key] = (self.clock() + self.ttl, quiz)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, quiz = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return quiz
+
+    def stats(self):
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_rate': (self.hits + self.coalesced) / requests if requests else 0.0,
+        }
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = self.coalesced = 0
+
+
+quiz_cache = QuizCache()
@@ -0,0 +1,91 @@
+"""
+Quiz generation requests to GROQ.
+
+``request_quiz`` asks for a whole quiz and parses the reply; streamed
+generation (``GenerateQuizStreamView``) shares the prompt.
+"""
+import json
+
+from .groqClient import chat_completion
+
+DEFAULT_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+
+class QuizParseError(ValueError):
+    """The model's reply did not contain a valid quiz."""
+
+    def __init__(self, message, raw_response):
+        super().__init__(message)
+        self.raw_response = raw_response
+
+
+def quiz_prompt(topic, difficulty, count):
+    """
+    Prompt asking GROQ for a quiz in the JSON shape the quiz endpoints parse.
+    """
+    return f"""Generate a timed quiz of {count} multiple-choice questions on the topic "{topic}" with difficulty level {difficulty}.
+    
+    Format the response as a JSON object with the following structure:
+    {{
+      "title": "Quiz title",
+      "questions": [
+        {{
+          "question": "Question text",
+          "options": ["Option A", "Option B", "Option C", "Option D"],
+          "correctAnswer": "Correct option letter (A, B, C, or D)",
+          "explanation": "Brief explanation of the answer"
+        }},
+        ... more questions
+      ],
+      "recommendedTimeInMinutes": recommended time to complete this quiz
+    }}
+    
+    Make sure all questions are factually accurate and each has exactly 4 answer options.
+    """
+
+
+async def request_quiz(topic, difficulty, count, model):
+    """
+    Ask GROQ for a quiz and return the parsed quiz data.
+
+    Raises QuizParseError carrying the raw reply if it cannot be parsed.
+    """
+    prompt = quiz_prompt(topic, difficulty, count)
+        
+    # Create GROQ completion
+    completion = await chat_completion(
+        model=model,
+        messages=[
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        temperature=0.7,
+        max_completion_tokens=2048,
+        top_p=1,
+        stream=False,
+        stop=None,
+    )
+    
+    # Extract response content
+    response_content = completion.choices[0].message.content
+    
+    # Try to extract JSON from the response
+    try:
+        # Look for JSON in code blocks or in the entire response
+        json_match = response_content.strip()
+        if "```json" in json_match:
+            json_match = json_match.split("```json")[1].split("```")[0].strip()
+        elif "```" in json_match:
+            json_match = json_match.split("```")[1].split("```")[0].strip()
+        
+        # Parse the JSON
+        quiz_data = json.loads(json_match)
+        
+        # Validate the quiz data structure
+        if "title" not in quiz_data or "questions" not in quiz_data:
+            raise ValueError("Invalid quiz data structure")
+    except Exception as json_error:
+        raise QuizParseError(str(json_error), response_content)
+    return quiz_data
@@ -0,0 +1,197 @@
+"""
+Pool of pre-generated quizzes.
+
+For the popular (topic, difficulty) pairs in QUIZ_POOL_TOPICS, up to
+QUIZ_POOL_DEPTH validated quizzes of QUIZ_POOL_QUESTIONS questions are kept
+ready in the Quiz/Question tables. ``generate_quiz`` takes one instead of
+waiting on GROQ, then has the pool topped up in the background.
+
+Refills run on a dedicated worker when QUIZ_POOL_CHANNEL is set:
+
+    python manage.py runworker quiz-pool
+
+and otherwise as a task on the event loop of the process that served the
+quiz. ``manage.py warm_quiz_pool`` fills every pooled pair, e.g. on deploy.
+"""
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+from ..models import Question, Quiz
+from .eventLog import get_logger, log_event
+from .quizGenerator import DEFAULT_MODEL, request_quiz
+from .quizService import correct_index
+
+logger = get_logger('pool')
+
+DEFAULT_DEPTH = 3
+DEFAULT_QUESTIONS = 5
+
+# Pairs with a refill running in this process
+_refilling = set()
+# Strong references to in-process refill tasks
+_tasks = set()
+
+
+def normalize_topic(topic):
+    return ' '.join(str(topic).split()).lower()
+
+
+def pool_depth():
+    return getattr(settings, 'QUIZ_POOL_DEPTH', DEFAULT_DEPTH)
+
+
+def pool_questions():
+    return getattr(settings, 'QUIZ_POOL_QUESTIONS', DEFAULT_QUESTIONS)
+
+
+def pool_channel():
+    """Channel of the pool worker, or None to refill in-process."""
+    return getattr(settings, 'QUIZ_POOL_CHANNEL', '') or None
+
+
+def is_pooled(topic, difficulty, count, model):
+    pairs = {
+        (normalize_topic(t), d.lower())
+        for t, d in getattr(settings, 'QUIZ_POOL_TOPICS', [])
+    }
+    return (
+        model == DEFAULT_MODEL
+        and count == pool_questions()
+        and (normalize_topic(topic), str(difficulty).lower()) in pairs
+    )
+
+
+def validate_quiz(quiz_data, count):
+    """Raise ValueError unless ``quiz_data`` holds ``count`` well-formed questions."""
+    questions = quiz_data.get('questions')
+    if not isinstance(questions, list) or len(questions) != count:
+        raise ValueError(f'Expected {count} questions')
+    for question in questions:
+        if not isinstance(question, dict) or not str(question.get('question') or '').strip():
+            raise ValueError('Question without text')
+        options = question.get('options')
+        if (not isinstance(options, list) or len(options) != 4
+                or not all(isinstance(o, str) and o.strip() for o in options)):
+            raise ValueError('Question without 4 options')
+        letter = str(question.get('correctAnswer', '')).strip().upper()[:1]
+        if letter not in ('A', 'B', 'C', 'D'):
+            raise ValueError('Question without a correct option letter')
+
+
+def store_quiz(topic, difficulty, count, model, quiz_data):
+    """Validate a generated quiz and add it to the pool."""
+    validate_quiz(quiz_data, count)
+    with transaction.atomic():
+        quiz = Quiz.objects.create(
+            topic=normalize_topic(topic),
+            difficulty_level=str(difficulty).lower(),
+            num_questions=count,
+            model=model,
+            title=str(quiz_data.get('title') or topic)[:255],
+        )
+        Question.objects.bulk_create([
+            Question(
+                quiz=quiz,
+                question_text=question['question'],
+                options=question['options'],
+                correct_answer=chr(ord('A') + correct_index(question)),
+                explanation=question.get('explanation') or '',
+            )
+            for question in quiz_data['questions']
+        ])
+    return quiz
+
+
+def take_quiz(topic, difficulty, count, model):
+    """
+    Remove one pooled quiz for this request and return it in the shape GROQ
+    generates, or None if the pool is empty.
+    """
+    with transaction.atomic():
+        quiz = (
+            Quiz.objects.select_for_update(skip_locked=True)
+            .filter(
+                topic=normalize_topic(topic),
+                difficulty_level=str(difficulty).lower(),
+                num_questions=count,
+                model=model,
+            )
+            .order_by('id')
+            .first()
+        )
+        if quiz is None:
+            return None
+        questions = list(quiz.question_set.all())
+        quiz.delete()
+    return {
+        'title': quiz.title,
+        'questions': [
+            {
+                'question': question.question_text,
+                'options': question.options,
+                'correctAnswer': question.correct_answer,
+                'explanation': question.explanation,
+            }
+            for question in questions
+        ],
+    }
+
+
+def pool_level(topic, difficulty, count, model):
+    return Quiz.objects.filter(
+        topic=normalize_topic(topic),
+        difficulty_level=str(difficulty).lower(),
+        num_questions=count,
+        model=model,
+    ).count()
+
+
+async def refill(topic, difficulty, count=None, model=DEFAULT_MODEL):
+    """Generate quizzes until the pool for this request is full again."""
+    count = count or pool_questions()
+    key = (normalize_topic(topic), str(difficulty).lower(), count, model)
+    if key in _refilling:
+        return
+    _refilling.add(key)
+    try:
+        # Give up after a few unusable generations rather than loop on GROQ
+        attempts = pool_depth() * 2
+        while attempts and await sync_to_async(pool_level)(topic, difficulty, count, model) < pool_depth():
+            attempts -= 1
+            try:
+                quiz_data = await request_quiz(topic, difficulty, count, model)
+                await sync_to_async(store_quiz)(topic, difficulty, count, model, quiz_data)
+            except ValueError as e:
+                log_event(logger, 'pool.discarded', logging.WARNING, key=key, error=str(e))
+    except Exception:
+        log_event(logger, 'pool.refill_failed', logging.ERROR, exc_info=True, key=key)
+    finally:
+        _refilling.discard(key)
+
+
+async def schedule_refill(topic, difficulty, count, model):
+    """Top up the pool for this request without waiting for it."""
+    channel = pool_channel()
+    if channel:
+        await get_channel_layer().send(channel, {
+            'type': 'pool.refill',
+            'topic': topic,
+            'difficulty': difficulty,
+            'count': count,
+            'model': model,
+        })
+        return
+    task = asyncio.ensure_future(refill(topic, difficulty, count, model))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def warm_pool():
+    """Fill the pool of every pair in QUIZ_POOL_TOPICS."""
+    for topic, difficulty in getattr(settings, 'QUIZ_POOL_TOPICS', []):
+        await refill(topic, difficulty)
@@ -0,0 +1,164 @@
+"""
+Compiled quizzes.
+
+Quizzes arrive in whatever shape the generator produced: the correct option
+may be given as ``correct_answer`` (index), ``correctAnswer`` (letter),
+``correct`` or an ``isCorrect`` flag on an option dict. ``normalize_quiz``
+resolves that once, when the game is created, so every stored question
+carries an int ``correct_answer``.
+
+Answer checking works on a ``CompiledQuiz``: an immutable tuple of questions
+with their correct index and the time limit, built once per room and cached
+by game id (codes are recycled), so scoring an answer is a tuple lookup. Questions are only
+ever appended to a room's quiz (while it is still being generated), so a
+cached quiz with fewer questions than the stored one is simply recompiled.
+"""
+from collections import OrderedDict, namedtuple
+
+DEFAULT_TIME_PER_QUESTION = 30
+
+# Number of rooms whose compiled quiz is kept in this process.
+QUIZ_CACHE_SIZE = 1024
+
+CompiledQuestion = namedtuple('CompiledQuestion', ['question', 'options', 'correct_index'])
+
+
+class CompiledQuiz(namedtuple('CompiledQuiz', ['questions', 'time_per_question'])):
+    __slots__ = ()
+
+    def question(self, index):
+        """The question at ``index``, or None when out of range."""
+        if 0 <= index < len(self.questions):
+            return self.questions[index]
+        return None
+
+    def is_valid_answer(self, index, answer):
+        """Whether ``answer`` is an option index of question ``index``."""
+        question = self.question(index)
+        return (
+            question is not None
+            and isinstance(answer, int) and not isinstance(answer, bool)
+            and 0 <= answer < len(question.options)
+        )
+
+    def is_correct(self, index, answer):
+        question = self.question(index)
+        return question is not None and answer == question.correct_index
+
+
+def _letter_index(value):
+    # 'A'..'D' (possibly as 'B)' or ' c ') -> 0..3
+    letter = str(value).strip().upper()[:1]
+    if letter in ('A', 'B', 'C', 'D'):
+        return ord(letter) - ord('A')
+    return None
+
+
+def _as_index(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return _letter_index(value)
+
+
+# Keys of a raw question dict that give its answer away
+ANSWER_KEYS = ('correct_answer', 'correctAnswer', 'correct')
+
+
+def correct_index(question):
+    """Index of the correct option of a raw question dict (0 if none is marked)."""
+    if 'correct_answer' in question:
+        index = _as_index(question['correct_answer'])
+    elif 'correctAnswer' in question:
+        index = _letter_index(question['correctAnswer'])
+    elif 'correct' in question:
+        index = _as_index(question['correct'])
+    else:
+        index = None
+        options = question.get('options')
+        if isinstance(options, list):
+            for i, option in enumerate(options):
+                if isinstance(option, dict) and option.get('isCorrect', False):
+                    index = i
+                    break
+    return index if index is not None else 0
+
+
+def normalize_question(question):
+    """Copy of a raw question dict with an int ``correct_answer``."""
+    return {**question, 'correct_answer': correct_index(question)}
+
+
+def public_question(question):
+    """Copy of a raw question dict without anything marking its correct option."""
+    public = {key: value for key, value in question.items() if key not in ANSWER_KEYS}
+    options = public.get('options')
+    if isinstance(options, list):
+        public['options'] = [
+            {key: value for key, value in option.items() if key != 'isCorrect'}
+            if isinstance(option, dict) else option
+            for option in options
+        ]
+    return public
+
+
+def normalize_quiz(quiz_data):
+    """Copy of ``quiz_data`` with an int ``correct_answer`` on every question."""
+    return {
+        **quiz_data,
+        'questions': [normalize_question(question) for question in quiz_data.get('questions', [])],
+    }
+
+
+def questions_pending(quiz_data, index):
+    """
+    Whether question ``index`` of a quiz that is still being generated (see
+    quizStream.py) has yet to arrive, so the room must wait for it.
+    """
+    quiz_data = quiz_data or {}
+    if not quiz_data.get('generating'):
+        return False
+    return len(quiz_data.get('questions', [])) <= index < quiz_data.get('expectedQuestions', 0)
+
+
+def compile_quiz(quiz_data):
+    quiz_data = quiz_data or {}
+    return CompiledQuiz(
+        questions=tuple(
+            CompiledQuestion(
+                question=question.get('question'),
+                options=tuple(question.get('options') or ()),
+                correct_index=correct_index(question),
+            )
+            for question in quiz_data.get('questions', [])
+        ),
+        time_per_question=quiz_data.get('timePerQuestion', DEFAULT_TIME_PER_QUESTION),
+    )
+
+
+_compiled = OrderedDict()
+
+
+def get_compiled_quiz(game_id, quiz_data):
+    """
+    The CompiledQuiz of game ``game_id``, compiling ``quiz_data`` on first use.
+
+    Entries are dropped to keep the cache within QUIZ_CACHE_SIZE, or replaced
+    when questions have been appended to the room's quiz since it was compiled.
+    """
+    quiz = _compiled.get(game_id)
+    if quiz is None or len(quiz.questions) != len((quiz_data or {}).get('questions', [])):
+        quiz = compile_quiz(quiz_data)
+        _compiled[game_id] = quiz
+        if len(_compiled) > QUIZ_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    else:
+        _compiled.move_to_end(game_id)
+    return quiz
+
+
+def clear_compiled_quizzes():
+    _compiled.clear()
@@ -0,0 +1,168 @@
+"""
+Streamed quiz generation.
+
+``QuizStreamParser`` is fed the model's reply as it arrives and hands back
+each question as soon as its JSON object closes, so questions can be shown
+(and played) while the rest of the quiz is still being generated.
+
+A streamed quiz can open its game room as soon as the first question is
+ready (``open_streamed_game``); later questions are appended to the room
+with ``append_questions`` and the room's sockets are told to resync.
+
+While generating, the room's ``quiz_data`` carries ``generating`` and the
+number of questions asked for (``expectedQuestions``): the room holds on a
+question whose successor has not arrived yet instead of ending the game.
+``finish_streamed_game`` clears the flag once the reply is over, and closes
+the room if the quiz was cut short (error, truncated reply, or the client
+went away).
+"""
+import json
+import re
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import GameRoom
+from .gameService import open_game
+from .quizService import normalize_question
+from .roomEngine import invalidate_room, schedule_question
+from .statsService import record_game
+
+_TITLE = re.compile(r'"title"\s*:\s*("(?:[^"\\]|\\.)*")')
+_QUESTIONS = re.compile(r'"questions"\s*:\s*\[')
+
+
+class QuizStreamParser:
+    """
+    Incremental parser for a reply shaped like the quiz generation prompt asks:
+    ``{"title": ..., "questions": [{...}, {...}], ...}``, possibly wrapped in
+    prose or code fences.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.title = None
+        self.questions = []
+        self._pos = None      # scan position inside the questions array
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None    # offset of the question object being read
+        self._done = False
+
+    def feed(self, chunk):
+        """Add ``chunk`` of the reply; returns the questions it completed."""
+        self.text += chunk
+        if self.title is None:
+            match = _TITLE.search(self.text)
+            if match:
+                self.title = json.loads(match.group(1))
+        if self._pos is None:
+            match = _QUESTIONS.search(self.text)
+            if match is None:
+                return []
+            self._pos = match.end()
+        return self._scan()
+
+    def _scan(self):
+        completed = []
+        text = self.text
+        i = self._pos
+        while i < len(text) and not self._done:
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    question = self._parse(text[self._start:i + 1])
+                    if question is not None:
+                        self.questions.append(question)
+                        completed.append(question)
+            elif char == ']' and self._depth == 0:
+                self._done = True
+            i += 1
+        self._pos = i
+        return completed
+
+    @property
+    def complete(self):
+        """Whether the questions array has been closed."""
+        return self._done
+
+    @staticmethod
+    def _parse(raw):
+        try:
+            question = json.loads(raw)
+        except ValueError:
+            return None
+        if not isinstance(question, dict) or 'question' not in question:
+            return None
+        return question
+
+
+def open_streamed_game(host, title, question, expected):
+    """
+    Open a room for a quiz whose first question has just been generated and
+    ``expected`` questions were asked for.
+    """
+    return open_game(host, {
+        'title': title,
+        'questions': [question],
+        'expectedQuestions': expected,
+        'generating': True,
+    })
+
+
+def append_questions(code, questions):
+    """Append freshly generated questions to room ``code``'s quiz."""
+    with transaction.atomic():
+        game = GameRoom.objects.select_for_update().get(code=code)
+        quiz_data = game.quiz_data or {}
+        quiz_data['questions'] = quiz_data.get('questions', []) + [
+            normalize_question(question) for question in questions
+        ]
+        game.quiz_data = quiz_data
+        game.save(update_fields=['quiz_data'])
+    invalidate_room(code)
+    # A room holding for these questions can move on
+    schedule_question(code)
+
+
+def finish_streamed_game(code, complete):
+    """
+    Stop room ``code`` waiting for questions. A complete quiz is played to
+    its last question; a quiz cut short closes the room.
+    """
+    with transaction.atomic():
+        game = GameRoom.objects.select_for_update().get(code=code)
+        quiz_data = game.quiz_data or {}
+        quiz_data['generating'] = False
+        started = game.status == 'in_progress'
+        fields = ['quiz_data']
+        if complete:
+            quiz_data['expectedQuestions'] = len(quiz_data.get('questions', []))
+        else:
+            quiz_data['generationFailed'] = True
+            if game.status != 'completed':
+                game.status = 'completed'
+                game.ended_at = timezone.now()
+                game.question_ends_at = None
+                fields += ['status', 'ended_at', 'question_ends_at']
+        game.quiz_data = quiz_data
+        game.save(update_fields=fields)
+    if not complete and started:
+        record_game(game.pk)
+    invalidate_room(code)
+    schedule_question(code)
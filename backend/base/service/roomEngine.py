@@ -0,0 +1,333 @@
+"""
+Applies client events to a room and fans the result out to its group.
+
+With a single ASGI process (``GAME_ENGINE_SHARDS = 0``) GameConsumer calls
+``handle_event`` directly against the RoomState held by that process.
+
+To run several ASGI workers behind a shared channel layer, set
+``GAME_ENGINE_SHARDS`` to N and run the engines with
+
+    python manage.py runworker game-engine-0 ... game-engine-<N-1>
+
+Each room is then owned by exactly one shard (``crc32(code) % N``). Sockets
+may land on any worker: they forward events to the owning shard, which applies
+them to its RoomState and ``group_send``s the patches, so every worker's
+sockets in ``game_{code}`` receive them in seq order.
+
+Answers posted over REST are applied to the owning room the same way
+(``submit_answer``), so they are broadcast as patches instead of making
+every client refetch the room's status.
+
+Question deadlines are kept by the process that owns the room: when a
+question's ``question_ends_at`` passes, answering closes and the results
+are scored and broadcast with the ranked leaderboard in one
+``question_closed`` patch; QUESTION_RESULTS_SECONDS later the room moves on
+to the next question by itself.
+"""
+import time
+import zlib
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from ..models import Player
+from .questionTimer import QuestionTimer
+from .roomState import PlayerState, discard_room, get_room, unwatch_room, watch_room
+from .statusCache import status_changed
+
+
+def engine_shards():
+    return getattr(settings, 'GAME_ENGINE_SHARDS', 0)
+
+
+def engine_channel(code):
+    """Name of the engine channel owning ``code``, or None when not sharded."""
+    shards = engine_shards()
+    if not shards:
+        return None
+    return f'game-engine-{zlib.crc32(code.encode()) % shards}'
+
+
+def group_name(code):
+    return f'game_{code}'
+
+
+def results_seconds():
+    return getattr(settings, 'QUESTION_RESULTS_SECONDS', 5)
+
+
+def invalidate_room(code):
+    """
+    Drop the cached state of a room after a write made outside the engine
+    (e.g. a REST endpoint), wherever that room is held, and tell the room's
+    sockets to refetch.
+    """
+    discard_room(code)
+    status_changed(code)
+    channel_layer = get_channel_layer()
+    channel = engine_channel(code)
+    if channel:
+        async_to_sync(channel_layer.send)(channel, {'type': 'room.discard', 'code': code})
+    async_to_sync(channel_layer.group_send)(group_name(code), {'type': 'room.invalidated'})
+
+
+async def watch(channel_layer, code):
+    """
+    Count a socket of room ``code`` in the process owning the room, which
+    keeps the room in memory while any socket is open.
+    """
+    channel = engine_channel(code)
+    if channel:
+        await channel_layer.send(channel, {'type': 'room.watch', 'code': code})
+    else:
+        watch_room(code)
+
+
+async def unwatch(channel_layer, code):
+    channel = engine_channel(code)
+    if channel:
+        await channel_layer.send(channel, {'type': 'room.unwatch', 'code': code})
+    else:
+        unwatch_room(code)
+
+
+def schedule_question(code):
+    """
+    Arm the deadline of room ``code`` after its question was changed outside
+    the engine (REST start or next question), in the process owning the room.
+    """
+    channel = engine_channel(code)
+    if channel:
+        async_to_sync(get_channel_layer().send)(channel, {'type': 'room.timer', 'code': code})
+    else:
+        async_to_sync(arm_room)(code)
+
+
+async def arm_room(code):
+    room = await get_room(code)
+    if room is not None:
+        arm_question(room)
+
+
+def arm_question(room):
+    """(Re)arm the timer for the current phase of ``room``'s question."""
+    if room.status != 'in_progress' or room.question_ends_at is None:
+        question_timer.cancel(room.code)
+        return
+    ends_at = room.question_ends_at.timestamp()
+    if time.time() < ends_at:
+        question_timer.arm(room.code, (room.current_question, 'close'), ends_at)
+    else:
+        question_timer.arm(
+            room.code, (room.current_question, 'advance'), ends_at + results_seconds()
+        )
+
+
+async def expire_question(code, key):
+    """Timer callback: close the question, or advance once its results were shown."""
+    question, phase = key
+    room = await get_room(code)
+    if room is None:
+        return
+    channel_layer = get_channel_layer()
+    async with room.lock:
+        if room.status != 'in_progress' or room.current_question != question:
+            # The host moved on (or the game ended) before the deadline
+            return
+        if phase == 'close':
+            patch = room.close_question()
+            if patch:
+                await broadcast(channel_layer, room, 'question_closed', patch)
+        else:
+            patch = room.advance()
+            if patch is None:
+                # The next question is still being generated: its arrival
+                # (quizStream.append_questions) re-arms the timer
+                return
+            await broadcast(channel_layer, room, 'next_question', patch)
+        arm_question(room)
+
+
+question_timer = QuestionTimer(expire_question)
+
+
+@database_sync_to_async
+def join_player(room, user_id, is_ready):
+    try:
+        user = User.objects.get(id=user_id)
+    except (User.DoesNotExist, ValueError, TypeError):
+        return None
+    player, created = Player.objects.get_or_create(
+        user=user,
+        game_id=room.game_id,
+        defaults={'is_ready': is_ready}
+    )
+    player.user = user
+    return PlayerState.from_model(player)
+
+
+async def broadcast(channel_layer, room, message_type, patch):
+    # Called with room.lock held so patches reach the group in seq order
+    await channel_layer.group_send(
+        group_name(room.code),
+        {'type': message_type, 'seq': patch['seq'], 'ops': patch['ops']}
+    )
+
+
+async def handle_event(channel_layer, room, data, user_id, reply):
+    """
+    Apply one client message to ``room``.
+
+    ``user_id`` is the authenticated user of the sending socket: events act
+    as that user whatever they claim. ``reply`` is a coroutine function
+    delivering a message to the sending socket only.
+    """
+    message_type = data['type']
+    # Rooms loaded after a restart pick their deadline back up
+    arm_question(room)
+
+    if message_type == 'resync':
+        # Client detected a gap in seq: replay what it missed, or resend everything
+        async with room.lock:
+            patches = room.patches_since(int(data.get('seq', -1)))
+            if patches is None:
+                await reply({
+                    'type': 'game_state',
+                    'seq': room.seq,
+                    'game': room.snapshot()
+                })
+            else:
+                for patch in patches:
+                    await reply({'type': 'game_state_patch', **patch})
+
+    elif message_type == 'answer_distribution':
+        # Live answer counts for the host's chart, straight from memory
+        if room.is_host(user_id):
+            await reply({'type': 'answer_distribution', **room.distribution()})
+
+    elif message_type == 'player_ready':
+        # Update player ready status
+        is_ready = data.get('is_ready', True)
+
+        player = room.get_player(user_id)
+        if player is None:
+            # First time we see this user in the room: create the row
+            player = await join_player(room, user_id, is_ready)
+            if player is None:
+                return
+
+        async with room.lock:
+            if room.get_player(player.user_id) is None:
+                await broadcast(channel_layer, room, 'game_state_patch', room.add_player(player))
+            patch = room.set_ready(room.get_player(player.user_id), is_ready)
+            await broadcast(channel_layer, room, 'game_state_patch', patch)
+
+    elif message_type == 'start_game':
+        # Start the game (only host can do this)
+        async with room.lock:
+            if room.is_host(user_id):
+                patch = room.start()
+                if patch:
+                    await broadcast(channel_layer, room, 'game_started', patch)
+                    arm_question(room)
+
+    elif message_type == 'next_question':
+        # Move to next question (only host can do this)
+        async with room.lock:
+            if room.is_host(user_id):
+                # Skipping ahead of the deadline still reveals the question
+                patch = room.close_question()
+                if patch:
+                    await broadcast(channel_layer, room, 'question_closed', patch)
+                patch = room.advance()
+                if patch:
+                    await broadcast(channel_layer, room, 'next_question', patch)
+                    arm_question(room)
+                elif room.questions_pending:
+                    await reply({'type': 'questions_pending', 'current_question': room.current_question})
+
+    elif message_type == 'submit_answer':
+        # Submit player answer
+        answer = data.get('answer')
+        if answer is not None:
+            await answer_question(channel_layer, room, user_id, answer, data.get('answer_time'))
+
+
+async def answer_question(channel_layer, room, user_id, answer, answer_time=None):
+    """
+    Record ``user_id``'s answer in ``room`` and tell the group who answered.
+    Returns the patch, or None if the answer was not recorded.
+    """
+    async with room.lock:
+        player = room.get_player(user_id)
+        if player is None:
+            return None
+        # Update the player's answer; it is scored when the question closes
+        patch = room.record_answer(player, answer, answer_time)
+        if patch is None:
+            return None
+
+        # Only who answered: answers and correctness wait for the close
+        await channel_layer.group_send(
+            group_name(room.code),
+            {
+                'type': 'answer_submitted',
+                'player': player.username,
+            }
+        )
+        await broadcast(channel_layer, room, 'game_state_patch', patch)
+    return patch
+
+
+def submit_answer(code, user_id, answer, answer_time=None):
+    """
+    Record an answer posted over REST in the process owning room ``code``,
+    which broadcasts it like a socket answer; the room is not invalidated.
+
+    Returns whether it was recorded (its write has reached the database by
+    then), or None when it was handed to the room's engine shard.
+    """
+    channel = engine_channel(code)
+    if channel:
+        async_to_sync(get_channel_layer().send)(channel, {
+            'type': 'room.answer',
+            'code': code,
+            'user_id': user_id,
+            'answer': answer,
+            'answer_time': answer_time,
+        })
+        return None
+    return async_to_sync(_submit_answer)(code, user_id, answer, answer_time)
+
+
+async def _submit_answer(code, user_id, answer, answer_time):
+    room = await answer_from_rest(code, user_id, answer, answer_time)
+    if room is None:
+        return False
+    await room.flush()
+    return True
+
+
+async def answer_from_rest(code, user_id, answer, answer_time=None):
+    """
+    Record a REST answer in room ``code`` held by this process, joining the
+    player first as the endpoint always allowed. Returns the room if the
+    answer was recorded, else None.
+    """
+    room = await get_room(code)
+    if room is None:
+        return None
+    channel_layer = get_channel_layer()
+    if room.get_player(user_id) is None:
+        player = await join_player(room, user_id, False)
+        if player is None:
+            return None
+        async with room.lock:
+            if room.get_player(player.user_id) is None:
+                await broadcast(channel_layer, room, 'game_state_patch', room.add_player(player))
+    if await answer_question(channel_layer, room, user_id, answer, answer_time) is None:
+        return None
+    return room
@@ -0,0 +1,574 @@
+"""
+In-process authoritative state for active game rooms.
+
+GameConsumer applies WebSocket events (player_ready, start_game, submit_answer,
+next_question) to a RoomState held in memory and broadcasts straight from it.
+The matching database writes are queued per room and run in the background,
+so building a game state for the group never touches the database.
+
+While a question is open, ``question_ends_at`` is the server's deadline for
+answers; the room engine closes the question and advances the room when it
+passes (see roomEngine.expire_question). Answer latency is measured against
+``question_opened_at``, a monotonic timestamp taken when the question opened.
+
+Clients get a full snapshot once (on connect or resync); every later change
+is broadcast as a small patch stamped with the room's sequence number. A
+client that sees a gap in ``seq`` asks for a resync and is sent the missing
+patches from a bounded history, or a fresh snapshot if they have been dropped.
+
+A process only holds the rooms it is using: a room is dropped once it has
+completed and its writes have drained, or when no socket has watched it
+and no event has touched it for ROOM_IDLE_TTL seconds. Sockets are counted
+by the process owning the room (see roomEngine.watch), and the group of an
+idle room that is dropped is told to resync, since a reload restarts its
+seq. A room dropped with writes still queued (``discard_room``) is not
+reloaded before they have reached the database.
+"""
+import asyncio
+import logging
+from collections import Counter, deque
+from datetime import timedelta
+from time import monotonic
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import GameRoom, Player
+from .eventLog import get_logger, log_event
+from .quizService import get_compiled_quiz, public_question, questions_pending
+from .leaderboardService import Leaderboard
+from .scoringService import (
+    SCORED_FIELDS, claim_question, clamp_latency, record_answer, score_answers,
+)
+from .statsService import record_game
+from .statusCache import status_changed
+
+logger = get_logger('room')
+
+# Number of recent patches kept per room for gap replay.
+PATCH_HISTORY = 256
+DEFAULT_IDLE_TTL = 10 * 60
+
+
+class PlayerState:
+    """In-memory copy of a Player row."""
+
+    __slots__ = (
+        'player_id', 'user_id', 'username', 'score', 'is_ready',
+        'current_answer', 'answer_time', 'total_questions', 'correct_answers',
+        'current_streak', 'best_streak', 'average_time',
+    )
+
+    def __init__(self, player_id, user_id, username, score=0, is_ready=False,
+                 current_answer=None, answer_time=None, total_questions=0,
+                 correct_answers=0, current_streak=0, best_streak=0, average_time=0.0):
+        self.player_id = player_id
+        self.user_id = user_id
+        self.username = username
+        self.score = score
+        self.is_ready = is_ready
+        self.current_answer = current_answer
+        self.answer_time = answer_time
+        self.total_questions = total_questions
+        self.correct_answers = correct_answers
+        self.current_streak = current_streak
+        self.best_streak = best_streak
+        self.average_time = average_time
+
+    @classmethod
+    def from_model(cls, player):
+        return cls(
+            player_id=player.id,
+            user_id=player.user_id,
+            username=player.user.username,
+            score=player.score,
+            is_ready=player.is_ready,
+            current_answer=player.current_answer,
+            answer_time=player.answer_time,
+            total_questions=player.total_questions,
+            correct_answers=player.correct_answers,
+            current_streak=player.current_streak,
+            best_streak=player.best_streak,
+            average_time=player.average_time,
+        )
+
+    def to_model(self):
+        """Unsaved Player carrying the scored fields, for ``bulk_update``."""
+        return Player(pk=self.player_id, **{field: getattr(self, field) for field in SCORED_FIELDS})
+
+    @property
+    def has_answered(self):
+        return self.current_answer is not None
+
+    def to_dict(self):
+        return {
+            'username': self.username,
+            'score': self.score,
+            'is_ready': self.is_ready,
+            'has_answered': self.has_answered,
+        }
+
+
+class RoomState:
+    """
+    Authoritative state of one game room.
+
+    Mutators update memory synchronously and queue the equivalent DB write;
+    callers hold ``lock`` while applying an event so that concurrent sockets
+    of the same room see a consistent order.
+    """
+
+    def __init__(self, game, players):
+        self.game_id = game.id
+        self.code = game.code
+        self.host_id = game.host_id
+        self.host = game.host.username
+        self.status = game.status
+        self.current_question = game.current_question
+        self.question_ends_at = game.question_ends_at
+        self.scored_question = game.scored_question
+        self.quiz_data = game.quiz_data or {}
+        self.quiz = get_compiled_quiz(game.id, self.quiz_data)
+        self.question_opened_at = self._opened_from_deadline()
+        self.started_at = game.started_at
+        self.ended_at = game.ended_at
+        self.players = {p.user_id: p for p in players}
+        self.board = Leaderboard((p.username, p.score) for p in players)
+        self._count_answers()
+        self.seq = 0
+        self._history = deque(maxlen=PATCH_HISTORY)
+        self.lock = asyncio.Lock()
+        self._writes = deque()
+        self._writer = None
+        self.last_used = monotonic()
+
+    @classmethod
+    def load(cls, code):
+        """Build a RoomState from the database (sync; one game + one player query)."""
+        try:
+            game = GameRoom.objects.select_related('host').get(code=code)
+        except GameRoom.DoesNotExist:
+            return None
+        players = Player.objects.filter(game=game).select_related('user').order_by('id')
+        return cls(game, [PlayerState.from_model(p) for p in players])
+
+    @property
+    def total_questions(self):
+        return len(self.quiz.questions)
+
+    def snapshot(self):
+        """Full game state in the shape GameConsumer has always sent."""
+        return {
+            'code': self.code,
+            'status': self.status,
+            'host': self.host,
+            'current_question': self.current_question,
+            'question_ends_at': _isoformat(self.question_ends_at),
+            'players': [p.to_dict() for p in self.players.values()],
+            'quiz_data': self.public_quiz_data(),
+        }
+
+    def public_quiz_data(self):
+        """``quiz_data`` without the answers of the questions not revealed yet."""
+        questions = self.quiz_data.get('questions', [])
+        revealed = len(questions) if self.status == 'completed' else self.scored_question + 1
+        return {
+            **self.quiz_data,
+            'questions': [
+                question if index < revealed else public_question(question)
+                for index, question in enumerate(questions)
+            ],
+        }
+
+    def get_player(self, user_id):
+        try:
+            return self.players.get(int(user_id))
+        except (TypeError, ValueError):
+            return None
+
+    def is_host(self, user_id):
+        try:
+            return int(user_id) == self.host_id
+        except (TypeError, ValueError):
+            return False
+
+    def get_player_by_username(self, username):
+        for player in self.players.values():
+            if player.username == username:
+                return player
+        return None
+
+    # Patches
+
+    def _patch(self, *ops):
+        self.seq += 1
+        patch = {'seq': self.seq, 'ops': list(ops)}
+        self._history.append(patch)
+        return patch
+
+    def patches_since(self, seq):
+        """
+        Patches a client that has applied up to ``seq`` is missing.
+
+        Returns None when they are no longer in the history and the client
+        needs a full snapshot instead.
+        """
+        if seq >= self.seq:
+            return []
+        if seq < 0 or not self._history or self._history[0]['seq'] > seq + 1:
+            return None
+        return [p for p in self._history if p['seq'] > seq]
+
+    # Events (each returns the patch to broadcast, or None if nothing changed)
+
+    def add_player(self, player):
+        self.players[player.user_id] = player
+        self.board.set(player.username, player.score)
+        return self._patch({'op': 'player_joined', 'player': player.to_dict()})
+
+    def set_ready(self, player, is_ready):
+        player.is_ready = is_ready
+        self._persist(_save_player_ready, player.player_id, is_ready)
+        return self._patch({'op': 'ready', 'username': player.username, 'is_ready': is_ready})
+
+    def _open_question(self, now):
+        self.question_ends_at = now + timedelta(seconds=self.quiz.time_per_question)
+        self.question_opened_at = monotonic()
+        self._count_answers()
+
+    def _count_answers(self):
+        # Per-option answer counters of the current question, kept as answers arrive
+        question = self.quiz.question(self.current_question)
+        self.answer_counts = [0] * (len(question.options) if question else 0)
+        self.answered = 0
+        for player in self.players.values():
+            if player.has_answered:
+                self._count_answer(player.current_answer)
+
+    def _count_answer(self, answer):
+        self.answered += 1
+        if isinstance(answer, int) and 0 <= answer < len(self.answer_counts):
+            self.answer_counts[answer] += 1
+
+    def distribution(self):
+        """Live answer counts of the current question, without touching the DB."""
+        return {
+            'current_question': self.current_question,
+            'counts': list(self.answer_counts),
+            'answered': self.answered,
+            'players': len(self.players),
+        }
+
+    def _opened_from_deadline(self):
+        # A room loaded from the database only knows the wall-clock deadline
+        if self.question_ends_at is None:
+            return None
+        remaining = (self.question_ends_at - timezone.now()).total_seconds()
+        return monotonic() - (self.quiz.time_per_question - remaining)
+
+    def answer_latency(self, client_time=None):
+        """
+        Seconds since the current question opened. Only games started before
+        deadlines were tracked fall back to the client-reported time.
+        """
+        time_limit = self.quiz.time_per_question
+        if self.question_opened_at is None:
+            return clamp_latency(client_time, time_limit)
+        return clamp_latency(monotonic() - self.question_opened_at, time_limit)
+
+    def accepting_answers(self, now=None):
+        """Whether the current question is still open for answers."""
+        if self.status != 'in_progress':
+            return False
+        return self.question_ends_at is None or (now or timezone.now()) < self.question_ends_at
+
+    def start(self):
+        if self.status != 'waiting':
+            return None
+        self.status = 'in_progress'
+        self.started_at = timezone.now()
+        self.current_question = 0
+        self._open_question(self.started_at)
+        self._persist(_save_game_started, self.game_id, self.started_at, self.question_ends_at)
+        return self._patch({
+            'op': 'status',
+            'status': self.status,
+            'current_question': 0,
+            'question_ends_at': _isoformat(self.question_ends_at),
+        })
+
+    def close_question(self):
+        """
+        Reveal the current question: score every answer in one pass and
+        return its results (the correct option, how many players picked each
+        option and the ranked leaderboard) as a single patch. Returns None
+        once the question has been revealed.
+        """
+        question = self.quiz.question(self.current_question)
+        if (self.status != 'in_progress' or question is None
+                or self.scored_question >= self.current_question):
+            return None
+        self.scored_question = self.current_question
+
+        scored, points = score_answers(
+            self.players.values(), question.correct_index, self.quiz.time_per_question,
+        )
+        for player in scored:
+            self.board.set(player.username, player.score)
+        self._persist(
+            _save_scores, self.game_id, self.current_question, [p.to_model() for p in scored],
+        )
+        return self._patch(
+            {
+                'op': 'question_closed',
+                'current_question': self.current_question,
+                'correct_answer': question.correct_index,
+                'distribution': list(self.answer_counts),
+                'answers': [
+                    {
+                        'username': player.username,
+                        'answer': player.current_answer,
+                        'is_correct': player.current_answer == question.correct_index,
+                        'points': gained,
+                    }
+                    for player, gained in zip(scored, points)
+                ],
+            },
+            {'op': 'leaderboard', 'players': self.leaderboard()},
+        )
+
+    def leaderboard(self, limit=None):
+        return self.board.top(limit)
+
+    @property
+    def questions_pending(self):
+        """Whether the next question is still being generated."""
+        return questions_pending(self.quiz_data, self.current_question + 1)
+
+    def advance(self):
+        """
+        Move to the next question; clients clear every ``has_answered`` flag.
+        Returns None while the next question is still being generated.
+        """
+        if self.status != 'in_progress' or self.questions_pending:
+            return None
+        for player in self.players.values():
+            player.current_answer = None
+            player.answer_time = None
+
+        now = timezone.now()
+        self.current_question += 1
+        if self.current_question >= self.total_questions:
+            self.status = 'completed'
+            self.ended_at = now
+            self.question_ends_at = None
+        else:
+            self._open_question(now)
+        self._persist(
+            _save_question_advanced, self.game_id, self.current_question,
+            self.status, self.ended_at, self.question_ends_at,
+        )
+        return self._patch({
+            'op': 'question',
+            'current_question': self.current_question,
+            'status': self.status,
+            'question_ends_at': _isoformat(self.question_ends_at),
+        })
+
+    def record_answer(self, player, answer, client_time=None):
+        """
+        Record a player's answer with its server-measured latency; it is
+        scored with everyone else's when the question is revealed.
+
+        Returns the patch, which only says that the player answered: what
+        they picked and whether it was right are sent when the question
+        closes. None if the player had already answered this question,
+        answering has closed or ``answer`` is not one of its option indexes.
+        """
+        if player.has_answered or not self.accepting_answers():
+            return None
+        if not self.quiz.is_valid_answer(self.current_question, answer):
+            return None
+        latency = round(self.answer_latency(client_time), 3)
+        player.current_answer = answer
+        player.answer_time = latency
+        self._count_answer(answer)
+        self._persist(_save_player_answer, player.player_id, answer, latency)
+        return self._patch({'op': 'answered', 'username': player.username})
+
+    # Background persistence
+
+    def _persist(self, func, *args):
+        self._writes.append((func, args))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.ensure_future(self._drain())
+
+    async def _drain(self):
+        while self._writes:
+            func, args = self._writes.popleft()
+            try:
+                applied = await database_sync_to_async(_apply_write)(self.code, func, args)
+            except Exception:
+                log_event(
+                    logger, 'room.persist_failed', logging.ERROR, exc_info=True,
+                    room=self.code, write=func.__name__
+                )
+            else:
+                if applied is False:
+                    await self._reload()
+        _drained(self)
+
+    async def _reload(self):
+        # The database disagrees with this room (a REST request scored the
+        # question first): drop it, so the next event loads the stored
+        # state, and have clients refetch
+        log_event(logger, 'room.reloaded', room=self.code)
+        discard_room(self.code)
+        await get_channel_layer().group_send(f'game_{self.code}', {'type': 'room.invalidated'})
+
+    @property
+    def pending_writes(self):
+        return self._writer is not None and not self._writer.done()
+
+    async def flush(self):
+        """Wait until every queued write for this room has reached the DB."""
+        while self.pending_writes:
+            await self._writer
+
+
+def _apply_write(code, func, args):
+    """Run a queued write; False means it was refused and the room is stale."""
+    applied = func(*args)
+    status_changed(code)
+    return applied
+
+
+def _save_player_ready(player_id, is_ready):
+    Player.objects.filter(pk=player_id).update(is_ready=is_ready)
+
+
+def _save_game_started(game_id, started_at, question_ends_at):
+    GameRoom.objects.filter(pk=game_id, status='waiting').update(
+        status='in_progress', started_at=started_at, current_question=0,
+        question_ends_at=question_ends_at,
+    )
+
+
+def _save_question_advanced(game_id, current_question, status, ended_at, question_ends_at):
+    Player.objects.filter(game_id=game_id).update(current_answer=None, answer_time=None)
+    GameRoom.objects.filter(pk=game_id).update(
+        current_question=current_question, status=status, ended_at=ended_at,
+        question_ends_at=question_ends_at,
+    )
+    if status == 'completed':
+        record_game(game_id)
+
+
+def _save_player_answer(player_id, answer, answer_time):
+    record_answer(Player.objects.filter(pk=player_id), answer, answer_time)
+
+
+def _save_scores(game_id, question, players):
+    with transaction.atomic():
+        # A REST request may already have scored this question
+        if not claim_question(game_id, question):
+            return False
+        Player.objects.bulk_update(players, SCORED_FIELDS)
+    return True
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+# Registry of rooms held by this process, keyed by game code.
+_rooms = {}
+# Rooms dropped while their writes were still queued
+_retired = {}
+# Sockets of this process connected to each room
+_watchers = Counter()
+_last_sweep = 0.0
+
+
+def idle_ttl():
+    return getattr(settings, 'ROOM_IDLE_TTL', DEFAULT_IDLE_TTL)
+
+
+async def get_room(code):
+    """Return the in-memory state for ``code``, loading it on first use."""
+    for evicted in evict_idle_rooms():
+        # Any socket still following it would see seq restart at 0
+        await get_channel_layer().group_send(f'game_{evicted}', {'type': 'room.invalidated'})
+    room = _rooms.get(code)
+    if room is None:
+        retired = _retired.get(code)
+        if retired is not None:
+            # Loading now could read the database before these writes land
+            await retired.flush()
+        room = await database_sync_to_async(RoomState.load)(code)
+        if room is None:
+            return None
+        room = _rooms.setdefault(code, room)
+    room.last_used = monotonic()
+    return room
+
+
+def peek_room(code):
+    """The in-memory state of ``code`` if this process holds it, without loading it."""
+    return _rooms.get(code)
+
+
+def discard_room(code):
+    """Forget a room so the next event reloads it (e.g. after a REST write)."""
+    room = _rooms.pop(code, None)
+    if room is not None and room.pending_writes:
+        _retired[code] = room
+
+
+def _drained(room):
+    # Every write of ``room`` has reached the database
+    if _retired.get(room.code) is room:
+        del _retired[room.code]
+    if room.status == 'completed' and _rooms.get(room.code) is room:
+        del _rooms[room.code]
+
+
+def watch_room(code):
+    _watchers[code] += 1
+
+
+def unwatch_room(code):
+    _watchers[code] -= 1
+    if _watchers[code] <= 0:
+        del _watchers[code]
+
+
+def evict_idle_rooms(now=None):
+    """
+    Drop rooms no socket watches and no event has touched for
+    ROOM_IDLE_TTL seconds (checked at most every ROOM_IDLE_TTL / 10).
+    Returns the codes of the rooms dropped.
+    """
+    global _last_sweep
+    now = monotonic() if now is None else now
+    ttl = idle_ttl()
+    if now - _last_sweep < ttl / 10:
+        return []
+    _last_sweep = now
+    evicted = []
+    for code, room in list(_rooms.items()):
+        if not _watchers[code] and now - room.last_used >= ttl and not room.pending_writes:
+            del _rooms[code]
+            evicted.append(code)
+    return evicted
+
+
+def clear_rooms():
+    global _last_sweep
+    _rooms.clear()
+    _retired.clear()
+    _watchers.clear()
+    _last_sweep = 0.0
@@ -0,0 +1,134 @@
+"""
+Scoring answers.
+
+Answers are recorded as they arrive and scored together when the question is
+revealed. Both the REST ``submit_answer`` view and the room engine record an
+answer with ``record_answer``: one conditional UPDATE that only matches while
+the player's ``current_answer`` is still NULL, so a player can answer each
+question once whichever path they use.
+
+At the reveal (the question's deadline, or the host moving on) every answer
+of the question is scored in one pass by ``score_answers`` and written with a
+single ``bulk_update``. ``GameRoom.scored_question`` is claimed with a
+conditional UPDATE first, so a question is scored exactly once even when the
+engine and a REST request both try.
+
+Both paths also score the same way: the latency of an answer is measured by
+the server from when the question opened (``answer_latency``), never taken
+from the client, and turned into points by ``answer_points``.
+"""
+from django.db import transaction
+
+from ..models import GameRoom, Player
+
+MAX_POINTS = 1000
+# Share of MAX_POINTS a correct answer still earns at the deadline
+MIN_POINTS_FACTOR = 0.1
+
+# Player fields written when a question is scored
+SCORED_FIELDS = [
+    'score', 'total_questions', 'correct_answers',
+    'current_streak', 'best_streak', 'average_time',
+]
+
+
+def clamp_latency(latency, time_limit):
+    """``latency`` in seconds, bounded to ``[0, time_limit]``."""
+    try:
+        latency = float(latency)
+    except (TypeError, ValueError):
+        return float(time_limit)
+    return min(max(latency, 0.0), float(time_limit))
+
+
+def answer_latency(question_ends_at, time_limit, now):
+    """
+    Seconds between a question opening and ``now``, from the question's
+    deadline (wall clock, so any process can measure it).
+    """
+    remaining = (question_ends_at - now).total_seconds()
+    return clamp_latency(time_limit - remaining, time_limit)
+
+
+def answer_points(latency, time_limit):
+    """
+    Points for a correct answer given ``latency`` seconds into a question of
+    ``time_limit`` seconds: MAX_POINTS when instant, falling linearly to
+    MIN_POINTS_FACTOR * MAX_POINTS at the deadline.
+    """
+    if time_limit <= 0:
+        return MAX_POINTS
+    fraction = clamp_latency(latency, time_limit) / time_limit
+    return round(MAX_POINTS * (1 - (1 - MIN_POINTS_FACTOR) * fraction))
+
+
+def record_answer(players, answer, answer_time):
+    """
+    Store ``answer`` for the player selected by ``players`` (a Player
+    queryset). Returns False without writing anything if the player has
+    already answered the current question (or does not exist).
+    """
+    return players.filter(current_answer__isnull=True).update(
+        current_answer=answer, answer_time=answer_time,
+    ) > 0
+
+
+def score_answers(players, correct_index, time_limit):
+    """
+    Score one question for every player in ``players`` who answered it.
+
+    ``players`` are Player rows or anything with the same fields (the room
+    engine's PlayerState); their score and stats are updated in place.
+    Returns the players that answered and the points each of them gained.
+    """
+    answered = [p for p in players if p.current_answer is not None]
+    latencies = [clamp_latency(p.answer_time, time_limit) for p in answered]
+    correct = [p.current_answer == correct_index for p in answered]
+    points = [
+        answer_points(latency, time_limit) if is_correct else 0
+        for latency, is_correct in zip(latencies, correct)
+    ]
+
+    for player, latency, is_correct, gained in zip(answered, latencies, correct, points):
+        player.score += gained
+        player.average_time = (
+            (player.average_time * player.total_questions + latency)
+            / (player.total_questions + 1)
+        )
+        player.total_questions += 1
+        if is_correct:
+            player.correct_answers += 1
+            player.current_streak += 1
+            player.best_streak = max(player.best_streak, player.current_streak)
+        else:
+            player.current_streak = 0
+    return answered, points
+
+
+def claim_question(game_id, question):
+    """Mark ``question`` of the game as scored; False if it already was."""
+    return GameRoom.objects.filter(pk=game_id, scored_question__lt=question).update(
+        scored_question=question,
+    ) > 0
+
+
+def reveal_question(game, quiz):
+    """
+    Score the current question of ``game`` from the database.
+
+    Returns the players (with their new scores) or None if the question had
+    already been scored.
+    """
+    question = quiz.question(game.current_question)
+    if question is None:
+        return None
+    with transaction.atomic():
+        if not claim_question(game.pk, game.current_question):
+            return None
+        players = list(
+            Player.objects.filter(game=game).select_related('user').select_for_update(of=('self',))
+        )
+        scored, _ = score_answers(players, question.correct_index, quiz.time_per_question)
+        Player.objects.bulk_update(scored, SCORED_FIELDS)
+    game.scored_question = game.current_question
+    return players
@@ -0,0 +1,95 @@
+"""
+Per-user totals across games.
+
+``PlayerStats`` holds one row per user with their totals over every
+completed game, so a profile reads a single row instead of summing all of
+the user's Player rows. ``record_game`` adds a game to its players' rows
+when it completes (``GameRoom.stats_recorded`` makes that happen once per
+game); ``rebuild_stats`` (``manage.py rebuild_player_stats``) recomputes the
+whole table from the Player rows, and migration 0016 ran it once to count
+the games completed before the table existed.
+"""
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Max, Sum
+
+from ..models import GameRoom, Player, PlayerStats
+from .leaderboardService import add_points
+
+STATS_FIELDS = [
+    'games_played', 'total_score', 'total_questions',
+    'correct_answers', 'best_streak', 'total_time',
+]
+
+
+def record_game(game_id):
+    """
+    Add completed game ``game_id`` to its players' stats.
+
+    Returns the number of players updated (0 if the game is not completed or
+    was already recorded).
+    """
+    with transaction.atomic():
+        claimed = GameRoom.objects.filter(
+            pk=game_id, status='completed', stats_recorded=False,
+        ).update(stats_recorded=True)
+        if not claimed:
+            return 0
+
+        players = list(Player.objects.filter(game_id=game_id).select_related('user'))
+        user_ids = [p.user_id for p in players]
+        PlayerStats.objects.bulk_create(
+            [PlayerStats(user_id=user_id) for user_id in user_ids], ignore_conflicts=True,
+        )
+        stats = {
+            s.user_id: s
+            for s in PlayerStats.objects.select_for_update().filter(user_id__in=user_ids)
+        }
+        for player in players:
+            row = stats[player.user_id]
+            row.games_played += 1
+            row.total_score += player.score
+            row.total_questions += player.total_questions
+            row.correct_answers += player.correct_answers
+            row.best_streak = max(row.best_streak, player.best_streak)
+            row.total_time += player.average_time * player.total_questions
+        PlayerStats.objects.bulk_update(stats.values(), STATS_FIELDS)
+    add_points((player.user.username, player.score) for player in players)
+    return len(players)
+
+
+def rebuild_stats(game_model=GameRoom, player_model=Player, stats_model=PlayerStats):
+    """
+    Recompute every user's stats from the Player rows of completed games.
+
+    The models can be a migration's historical ones (0016 backfills with it).
+    """
+    # Annotation names must not shadow the Player fields being summed
+    totals = (
+        player_model.objects.filter(game__status='completed')
+        .values('user_id')
+        .annotate(
+            games=Count('id'),
+            score_sum=Sum('score'),
+            questions_sum=Sum('total_questions'),
+            correct_sum=Sum('correct_answers'),
+            streak_max=Max('best_streak'),
+            time_sum=Sum(F('average_time') * F('total_questions'), output_field=FloatField()),
+        )
+    )
+    rows = [
+        stats_model(
+            user_id=row['user_id'],
+            games_played=row['games'],
+            total_score=row['score_sum'],
+            total_questions=row['questions_sum'],
+            correct_answers=row['correct_sum'],
+            best_streak=row['streak_max'],
+            total_time=row['time_sum'] or 0.0,
+        )
+        for row in totals
+    ]
+    with transaction.atomic():
+        stats_model.objects.all().delete()
+        stats_model.objects.bulk_create(rows, batch_size=1000)
+        game_model.objects.filter(status='completed').update(stats_recorded=True)
+    return stats_model.objects.count()
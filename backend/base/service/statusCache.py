@@ -0,0 +1,29 @@
+"""
+ETags for the game status endpoint.
+
+Every room has an opaque status version kept in the Django cache. Anything
+that changes what ``get_game_status`` would return calls ``status_changed``,
+which drops the version; the next request mints a new one. Clients polling
+with ``If-None-Match`` get a 304 straight from the cache while nothing has
+changed, without loading the game or its players.
+"""
+import uuid
+
+from django.core.cache import cache
+
+
+def _key(code):
+    return f'game-status-etag:{code}'
+
+
+def current_etag(code):
+    """ETag of the current status of ``code`` (minted on first use)."""
+    etag = cache.get(_key(code))
+    if etag is None:
+        cache.add(_key(code), f'"{uuid.uuid4().hex}"')
+        etag = cache.get(_key(code))
+    return etag
+
+
+def status_changed(code):
+    cache.delete(_key(code))
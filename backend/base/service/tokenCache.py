@@ -0,0 +1,116 @@
+"""
+Cache of API tokens.
+
+Every REST request authenticates its token, and clients poll status every
+two seconds and chat every three, so looking the token and its user up in
+the database each time doubles the load of those endpoints. Authenticated
+tokens are kept for TOKEN_CACHE_TTL seconds in an in-process LRU of at most
+TOKEN_CACHE_SIZE entries or, with TOKEN_CACHE_ALIAS set, in that Django
+cache, shared by every worker.
+
+Entries are dropped when their token is deleted (logout) and when their
+user is saved (deactivation, renames); see base/signals.py. The in-process
+cache can only be cleared in the process that made the change, so with
+several workers and no shared cache a revoked token keeps working elsewhere
+for up to TOKEN_CACHE_TTL seconds. Unknown keys and inactive users are
+never cached.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_TTL = 60
+DEFAULT_SIZE = 10000
+
+
+def _detach(user, token):
+    """Copies of ``user`` and ``token``, so no request changes a cached entry."""
+    user = copy.copy(user)
+    token = copy.copy(token)
+    token.user = user
+    return user, token
+
+
+class TokenCache:
+    def __init__(self, ttl=None, size=None, alias=None, clock=time.monotonic):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'TOKEN_CACHE_TTL', DEFAULT_TTL)
+        self.size = size if size is not None else getattr(settings, 'TOKEN_CACHE_SIZE', DEFAULT_SIZE)
+        self.alias = alias if alias is not None else getattr(settings, 'TOKEN_CACHE_ALIAS', None)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, user, token)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _shared_key(key):
+        # Token keys are credentials: keep them out of the shared cache's keys
+        return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        """``(user, token)`` for token ``key``, or None if it is not cached."""
+        if self.alias:
+            entry = caches[self.alias].get(self._shared_key(key))
+        else:
+            entry = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _detach(*entry)
+
+    def put(self, token):
+        """Cache ``token`` (with its user loaded) if its user may log in."""
+        if not token.user.is_active:
+            return
+        user, token = _detach(token.user, token)
+        if self.alias:
+            caches[self.alias].set(self._shared_key(token.key), (user, token), self.ttl)
+            return
+        with self._lock:
+            self._entries[token.key] = (self.clock() + self.ttl, user, token)
+            self._entries.move_to_end(token.key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        if self.alias:
+            caches[self.alias].delete_many([self._shared_key(key) for key in keys])
+            return
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user, token = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user, token
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.hits = self.misses = 0
+
+
+token_cache = TokenCache()
@@ -1,10 +1,11 @@
 # For User Authentication using token
 
 from django.contrib.auth.models import User  
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 from .models import UserProfile
+from .service.tokenCache import token_cache
 
 @receiver(post_save, sender=User)  
 def create_auth_token(sender, instance=None, created=False, **kwargs):
@@ -14,4 +15,15 @@ def create_auth_token(sender, instance=None, created=False, **kwargs):
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance=None, created=False, **kwargs):
     if created:
-        UserProfile.objects.create(user=instance)
\ No newline at end of file
+        UserProfile.objects.create(user=instance)
+
+# A cached token must not outlive its deletion (logout) or a change to its
+# user (deactivation)
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance=None, **kwargs):
+    token_cache.invalidate(instance.key)
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance=None, created=False, **kwargs):
+    if not created:
+        token_cache.invalidate(*Token.objects.filter(user=instance).values_list('key', flat=True))
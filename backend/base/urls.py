@@ -12,8 +12,10 @@ urlpatterns = [
     
     path('api/token-auth/', ObtainAuthToken.as_view(), name='token-auth'),  # Built-in token authentication
     
-    path('api/groq-chat/', views.groq_chat, name='groq-chat'),  # GROQ AI endpoint
-    path('api/generate-quiz/', views.generate_quiz, name='generate-quiz'),  # Quiz generation endpoint
+    path('api/groq-chat/', views.GroqChatView.as_view(), name='groq-chat'),  # GROQ AI endpoint
+    path('api/generate-quiz/', views.GenerateQuizView.as_view(), name='generate-quiz'),  # Quiz generation endpoint
+    path('api/generate-quiz/stream/', views.GenerateQuizStreamView.as_view(), name='generate-quiz-stream'),  # Streamed quiz generation (SSE)
+    path('api/generate-quiz/stats/', views.quiz_cache_stats, name='quiz-cache-stats'),  # Quiz cache hit rate
     
     path('api/profile/', views.get_profile, name='get-profile'),  # Get user profile
     path('api/profile/update/', views.update_profile, name='update-profile'),  # Update user profile
@@ -32,7 +34,7 @@ urlpatterns = [
     path('api/chat/<str:pin>/', views.get_chat_messages, name='get-chat-messages'),
     
     # Leaderboard endpoint
-    path('api/game/<str:game_code>/leaderboard/', views.get_leaderboard, name='get-leaderboard'),
+    path('api/leaderboard/', views.global_leaderboard, name='global-leaderboard'),
 
     # Answer distribution endpoint
     path('api/answer_distribution/<str:pin>/', views.answer_distribution, name='answer_distribution'),
@@ -4,7 +4,7 @@ from django.conf import settings
 from groq import Groq
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 
 # Initialize GROQ client
@@ -15,13 +15,35 @@ try:
 except Exception as e:
     print(f"Error initializing GROQ client: {e}")
     client = None
-from rest_framework.authentication import TokenAuthentication
+from .authentication import CachedTokenAuthentication
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 import json
 import os
-from .models import UserProfile, GameRoom, Player,ChatMessage
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from channels.layers import get_channel_layer
+from .models import UserProfile, GameRoom, Player, PlayerStats, ChatMessage
 from .serializers import GameRoomSerializer
+from .asyncviews import AsyncAPIView
+from .service.gameService import leaderboard_limit, open_game
+from .service.groqClient import APITimeoutError, chat_completion, stream_completion
+from .service.leaderboardService import global_leaderboard as get_global_leaderboard, standings
+from .service.quizGenerator import QuizParseError, quiz_prompt, request_quiz
+from .service.quizPool import is_pooled, schedule_refill, take_quiz
+from .service.quizCache import quiz_cache, quiz_key
+from .service.quizService import get_compiled_quiz
+from .service.quizStream import QuizStreamParser, append_questions, finish_streamed_game, open_streamed_game
+from .service.roomEngine import group_name
+from .service.roomState import peek_room
+
+# Chat history page sizes
+CHAT_PAGE_SIZE = 50
+CHAT_MAX_PAGE_SIZE = 200
+
+# Entries returned by the global leaderboard when no limit is given
+GLOBAL_LEADERBOARD_SIZE = 100
 
 # Initialize GROQ client with API key from settings
 client = Groq(
@@ -52,6 +74,16 @@ quiz_generation_schema = openapi.Schema(
     required=['topic']
 )
 
+# Streamed generation takes the same fields, plus whether to open a room early
+quiz_stream_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        **quiz_generation_schema.properties,
+        'create_game': openapi.Schema(type=openapi.TYPE_BOOLEAN, description='Open a game room as soon as the first question is ready', default=False),
+    },
+    required=['topic']
+)
+
 # Define request body schema for profile update
 profile_update_schema = openapi.Schema(
     type=openapi.TYPE_OBJECT,
@@ -65,58 +97,59 @@ profile_update_schema = openapi.Schema(
 )
 
 # API - http://127.0.0.1:8000/api/groq-chat/ (POST request)
-@swagger_auto_schema(
-    method='post', 
-    request_body=groq_chat_schema, 
-    responses={200: "GROQ response successful", 400: "Invalid request", 500: "GROQ API error"}
-)
-@api_view(['POST'])
-def groq_chat(request):
-    """
-    Endpoint to interact with GROQ AI.
-    """
-    try:
-        data = request.data
-        prompt = data.get('prompt')
-        model = data.get('model', "meta-llama/llama-4-scout-17b-16e-instruct")
-        max_tokens = data.get('max_tokens', 1024)
-        temperature = data.get('temperature', 1.0)
-        
-        if not prompt:
-            return Response({"error": "Prompt is required"}, status=400)
+class GroqChatView(AsyncAPIView):
+    @swagger_auto_schema(
+        request_body=groq_chat_schema, 
+        responses={200: "GROQ response successful", 400: "Invalid request", 500: "GROQ API error", 504: "GROQ timed out"}
+    )
+    async def post(self, request):
+        """
+        Endpoint to interact with GROQ AI.
+        """
+        try:
+            data = request.data
+            prompt = data.get('prompt')
+            model = data.get('model', "meta-llama/llama-4-scout-17b-16e-instruct")
+            max_tokens = data.get('max_tokens', 1024)
+            temperature = data.get('temperature', 1.0)
             
-        # Create GROQ completion
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
+            if not prompt:
+                return Response({"error": "Prompt is required"}, status=400)
+                
+            # Create GROQ completion
+            completion = await chat_completion(
+                model=model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                temperature=temperature,
+                max_completion_tokens=max_tokens,
+                top_p=1,
+                stream=False,
+                stop=None,
+            )
+            
+            # Extract response content
+            response_content = completion.choices[0].message.content
+            
+            return Response({
+                "success": True,
+                "response": response_content,
+                "model": model,
+                "usage": {
+                    "input_tokens": completion.usage.prompt_tokens,
+                    "output_tokens": completion.usage.completion_tokens,
+                    "total_tokens": completion.usage.total_tokens
                 }
-            ],
-            temperature=temperature,
-            max_completion_tokens=max_tokens,
-            top_p=1,
-            stream=False,
-            stop=None,
-        )
-        
-        # Extract response content
-        response_content = completion.choices[0].message.content
-        
-        return Response({
-            "success": True,
-            "response": response_content,
-            "model": model,
-            "usage": {
-                "input_tokens": completion.usage.prompt_tokens,
-                "output_tokens": completion.usage.completion_tokens,
-                "total_tokens": completion.usage.total_tokens
-            }
-        })
-        
-    except Exception as e:
-        return Response({"error": str(e)}, status=500)
+            })
+            
+        except APITimeoutError:
+            return Response({"error": "GROQ request timed out"}, status=504)
+        except Exception as e:
+            return Response({"error": str(e)}, status=500)
 
 # API - http://127.0.0.1:8000/api/generate-quiz/ (POST request)
 
@@ -126,7 +159,7 @@ def groq_chat(request):
     responses={200: GameRoomSerializer}
 )
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def get_game_status(request, game_code):
     """
@@ -188,7 +221,7 @@ def get_game_status(request, game_code):
     responses={200: "Player ready status updated successfully"}
 )
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def set_player_ready(request, game_code):
     """
@@ -228,7 +261,7 @@ def set_player_ready(request, game_code):
     responses={200: "Game started successfully"}
 )
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def start_game(request, game_code):
     """
@@ -264,104 +297,201 @@ def start_game(request, game_code):
         }, status=404)
 
 # API - http://127.0.0.1:8000/api/generate-quiz/ (POST request)
-@swagger_auto_schema(
-    method='post', 
-    request_body=quiz_generation_schema, 
-    responses={200: "Quiz generated successfully", 400: "Invalid request", 500: "Quiz generation error"}
-)
-@api_view(['POST'])
-def generate_quiz(request):
-    """
-    Endpoint to generate a quiz using GROQ AI.
-    """
-    if client is None:
-        return Response({"error": "GROQ client is not properly configured"}, status=500)
-        
-    try:
-        data = request.data
-        topic = data.get('topic')
-        difficulty = data.get('difficulty', 'medium')
-        count = data.get('count', 5)
-        model = data.get('model', "meta-llama/llama-4-scout-17b-16e-instruct")
-        
-        if not topic:
-            return Response({"error": "Topic is required"}, status=400)
-        
-        # Create the prompt for quiz generation
-        prompt = f"""Generate a timed quiz of {count} multiple-choice questions on the topic "{topic}" with difficulty level {difficulty}.
-        
-        Format the response as a JSON object with the following structure:
-        {{
-          "title": "Quiz title",
-          "questions": [
-            {{
-              "question": "Question text",
-              "options": ["Option A", "Option B", "Option C", "Option D"],
-              "correctAnswer": "Correct option letter (A, B, C, or D)",
-              "explanation": "Brief explanation of the answer"
-            }},
-            ... more questions
-          ],
-          "recommendedTimeInMinutes": recommended time to complete this quiz
-        }}
-        
-        Make sure all questions are factually accurate and each has exactly 4 answer options.
+class GenerateQuizView(AsyncAPIView):
+    @swagger_auto_schema(
+        request_body=quiz_generation_schema, 
+        responses={200: "Quiz generated successfully", 400: "Invalid request", 500: "Quiz generation error", 504: "GROQ timed out"}
+    )
+    async def post(self, request):
         """
-            
-        # Create GROQ completion
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.7,
-            max_completion_tokens=2048,
-            top_p=1,
-            stream=False,
-            stop=None,
-        )
+        Endpoint to generate a quiz using GROQ AI.
+        """
+        try:
+            data = request.data
+            topic = data.get('topic')
+            difficulty = data.get('difficulty', 'medium')
+            count = data.get('count', 5)
+            model = data.get('model', "meta-llama/llama-4-scout-17b-16e-instruct")
         
-        # Extract response content
-        response_content = completion.choices[0].message.content
+            if not topic:
+                return Response({"error": "Topic is required"}, status=400)
+            try:
+                count = int(count)
+            except (TypeError, ValueError):
+                return Response({"error": "Count must be an integer"}, status=400)
         
-        # Try to extract JSON from the response
-        try:
-            # Look for JSON in code blocks or in the entire response
-            json_match = response_content.strip()
-            if "```json" in json_match:
-                json_match = json_match.split("```json")[1].split("```")[0].strip()
-            elif "```" in json_match:
-                json_match = json_match.split("```")[1].split("```")[0].strip()
-            
-            # Parse the JSON
-            quiz_data = json.loads(json_match)
-            
-            # Validate the quiz data structure
-            if "title" not in quiz_data or "questions" not in quiz_data:
-                raise ValueError("Invalid quiz data structure")
-                
+            # Popular requests are served from the pre-generated pool, which
+            # is then topped up in the background
+            if is_pooled(topic, difficulty, count, model):
+                quiz_data = await sync_to_async(take_quiz)(topic, difficulty, count, model)
+                await schedule_refill(topic, difficulty, count, model)
+                if quiz_data is not None:
+                    return Response({
+                        "success": True,
+                        "quiz": quiz_data,
+                        "topic": topic,
+                        "difficulty": difficulty,
+                        "count": count,
+                        "cached": True
+                    })
+
+            # Identical requests are served from the quiz cache and share one upstream call
+            try:
+                quiz_data, cached = await quiz_cache.get_or_generate(
+                    quiz_key(topic, difficulty, count, model),
+                    lambda: request_quiz(topic, difficulty, count, model)
+                )
+            except QuizParseError as json_error:
+                # If JSON parsing failed, return the raw response
+                return Response({
+                    "success": False,
+                    "error": f"Failed to parse quiz data: {str(json_error)}",
+                    "raw_response": json_error.raw_response
+                }, status=400)
+
             # Return the quiz data
             return Response({
                 "success": True,
                 "quiz": quiz_data,
                 "topic": topic,
                 "difficulty": difficulty,
-                "count": count
+                "count": count,
+                "cached": cached
             })
-            
-        except Exception as json_error:
-            # If JSON parsing failed, return the raw response
-            return Response({
-                "success": False,
-                "error": f"Failed to parse quiz data: {str(json_error)}",
-                "raw_response": response_content
-            }, status=400)
         
+        except APITimeoutError:
+            return Response({"error": "GROQ request timed out"}, status=504)
+        except Exception as e:
+            return Response({"error": str(e)}, status=500)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def stream_quiz_events(host, topic, difficulty, count, model):
+    """
+    Server-sent events for a streamed quiz generation.
+
+    Emits ``question`` for each question as soon as its JSON is complete and,
+    when ``host`` is given, ``game`` once their room has been opened with the
+    first question (later questions are appended to it). Ends with ``done``
+    carrying the whole quiz, or ``error`` (which also closes the room) if the
+    reply failed or was cut short.
+    """
+    key = quiz_key(topic, difficulty, count, model)
+    try:
+        cached = quiz_cache.get(key)
+        if cached is not None:
+            for index, question in enumerate(cached["questions"]):
+                yield sse_event("question", {"index": index, "question": question})
+            if host is not None:
+                game = await sync_to_async(open_game)(host, cached)
+                yield sse_event("game", {"game_code": game.code})
+            yield sse_event("done", {"quiz": cached, "cached": True})
+            return
+
+        parser = QuizStreamParser()
+        game_code = None
+        generated = False
+        try:
+            async for text in stream_completion(
+                model=model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": quiz_prompt(topic, difficulty, count)
+                    }
+                ],
+                temperature=0.7,
+                max_completion_tokens=2048,
+                top_p=1,
+                stop=None,
+            ):
+                completed = parser.feed(text)
+                if not completed:
+                    continue
+                start = len(parser.questions) - len(completed)
+                for offset, question in enumerate(completed):
+                    yield sse_event("question", {"index": start + offset, "question": question})
+
+                if host is not None:
+                    if game_code is None:
+                        game = await sync_to_async(open_streamed_game)(
+                            host, parser.title or topic, completed[0], count
+                        )
+                        game_code = game.code
+                        yield sse_event("game", {"game_code": game_code})
+                        completed = completed[1:]
+                    if completed:
+                        await sync_to_async(append_questions)(game_code, completed)
+            generated = parser.complete
+        finally:
+            # However the reply ended (errors and client disconnects too),
+            # the room stops waiting for more questions
+            if game_code is not None:
+                await sync_to_async(finish_streamed_game)(game_code, generated)
+
+        if not parser.questions:
+            yield sse_event("error", {
+                "error": "Failed to parse quiz data",
+                "raw_response": parser.text
+            })
+            return
+        if not parser.complete:
+            yield sse_event("error", {
+                "error": "The quiz was cut short",
+                "questions": len(parser.questions),
+                "raw_response": parser.text
+            })
+            return
+
+        quiz = {"title": parser.title or topic, "questions": parser.questions}
+        quiz_cache.put(key, quiz)
+        yield sse_event("done", {"quiz": quiz, "cached": False})
+
+    except APITimeoutError:
+        yield sse_event("error", {"error": "GROQ request timed out"})
     except Exception as e:
-        return Response({"error": str(e)}, status=500)
+        yield sse_event("error", {"error": str(e)})
+
+# API - http://127.0.0.1:8000/api/generate-quiz/stream/ (POST request)
+class GenerateQuizStreamView(AsyncAPIView):
+    @swagger_auto_schema(
+        request_body=quiz_stream_schema,
+        responses={200: "text/event-stream of question, game, done and error events", 400: "Invalid request"}
+    )
+    async def post(self, request):
+        """
+        Generate a quiz, streaming each question as soon as it is generated.
+        """
+        data = request.data
+        topic = data.get('topic')
+        difficulty = data.get('difficulty', 'medium')
+        count = data.get('count', 5)
+        model = data.get('model', "meta-llama/llama-4-scout-17b-16e-instruct")
+
+        if not topic:
+            return Response({"error": "Topic is required"}, status=400)
+        try:
+            count = int(count)
+        except (TypeError, ValueError):
+            return Response({"error": "Count must be an integer"}, status=400)
+
+        host = request.user if data.get('create_game') else None
+        response = StreamingHttpResponse(
+            stream_quiz_events(host, topic, difficulty, count, model),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def quiz_cache_stats(request):
+    """
+    Hit rate and size of the generated quiz cache in this process.
+    """
+    return Response(quiz_cache.stats())
 
 # Example of the streaming version (for testing in the terminal)
 def test_groq_streaming():
@@ -397,7 +527,7 @@ def test_groq_streaming():
     responses={200: "Profile updated successfully", 400: "Invalid request"}
 )
 @api_view(['POST'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def update_profile(request):
     """
@@ -466,7 +596,7 @@ def update_profile(request):
     responses={200: "Profile retrieved successfully", 404: "Profile not found"}
 )
 @api_view(['GET'])
-@authentication_classes([TokenAuthentication])
+@authentication_classes([CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def get_profile(request):
     """
@@ -476,15 +606,9 @@ def get_profile(request):
         user = request.user
         profile = UserProfile.objects.get(user=user)
 
-        # Fetch stats across all games
-        player_entries = Player.objects.filter(user=user)
-        total_correct = sum(p.correct_answers for p in player_entries)
-        total_questions = sum(p.total_questions for p in player_entries)
-        best_streak = max((p.best_streak for p in player_entries), default=0)
-
-        # Compute global average time
-        total_time = sum(p.average_time * p.total_questions for p in player_entries)
-        average_time = (total_time / total_questions) if total_questions else 0.0
+        # Totals across completed games only (a game in progress counts once
+        # it ends), kept up to date as games end
+        stats = PlayerStats.objects.filter(user=user).first() or PlayerStats(user=user)
         
         return Response({
             'success': True,
@@ -494,10 +618,12 @@ def get_profile(request):
                 'bio': profile.bio,
                 'avatar_url': profile.avatar_url,
                 'username': user.username,
-                'correct_answers': total_correct,
-                'total_questions': total_questions,
-                'best_streak': best_streak,
-                'average_time': round(average_time, 2),
+                'correct_answers': stats.correct_answers,
+                'total_questions': stats.total_questions,
+                'best_streak': stats.best_streak,
+                'average_time': round(stats.average_time, 2),
+                'games_played': stats.games_played,
+                'total_score': stats.total_score,
             }
         })
         
@@ -512,6 +638,14 @@ def get_profile(request):
             'message': str(e)
         }, status=400)
 
+def serialize_chat_message(m):
+    return {
+        "id": m.id,
+        "sender": m.sender.username,
+        "message": m.message,
+        "timestamp": m.timestamp
+    }
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def send_chat_message(request):
@@ -525,29 +659,78 @@ def send_chat_message(request):
             sender=request.user,
             message=message
         )
-        return Response({"message": "Sent"})
+        # Push to everyone connected to the room
+        chat.sender = request.user
+        payload = serialize_chat_message(chat)
+        payload["timestamp"] = chat.timestamp.isoformat()
+        async_to_sync(get_channel_layer().group_send)(
+            group_name(room.code),
+            {"type": "chat.message", "message": payload}
+        )
+        return Response({"message": "Sent", "id": chat.id})
     except GameRoom.DoesNotExist:
         return Response({"error": "Room not found"}, status=404)
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_chat_messages(request, pin):
+    """
+    Chat history for a room, oldest first.
+
+    Pass ``since_id`` to get only messages newer than the last one you have;
+    without it the most recent page is returned, and ``before_id`` pages back
+    through older history. At most ``limit`` messages (default
+    CHAT_PAGE_SIZE, capped at CHAT_MAX_PAGE_SIZE) come back per call.
+    On ``since_id`` pages ``has_more`` says whether newer messages are left
+    (ask again with the returned ``last_id``); the latest and ``before_id``
+    pages say with ``has_older`` whether older ones are left (ask again with
+    ``before_id`` set to the returned ``first_id``).
+    """
     try:
         room = GameRoom.objects.get(code=pin)
         
         # Check if user is a player in this game
         if not room.players.filter(user=request.user).exists():
             return Response({"error": "You are not a player in this game"}, status=403)
-            
-        messages = ChatMessage.objects.filter(game_room=room).order_by("timestamp")
+
+        try:
+            limit = min(int(request.query_params.get("limit", CHAT_PAGE_SIZE)), CHAT_MAX_PAGE_SIZE)
+            since_id = request.query_params.get("since_id")
+            since_id = int(since_id) if since_id is not None else None
+            before_id = request.query_params.get("before_id")
+            before_id = int(before_id) if before_id is not None else None
+        except ValueError:
+            return Response({"error": "since_id, before_id and limit must be integers"}, status=400)
+        if limit < 1:
+            return Response({"error": "limit must be positive"}, status=400)
+        if since_id is not None and before_id is not None:
+            return Response({"error": "Pass since_id or before_id, not both"}, status=400)
+
+        messages = ChatMessage.objects.filter(game_room=room).select_related("sender")
+        if since_id is not None:
+            page = list(messages.filter(id__gt=since_id).order_by("id")[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+            return Response({
+                "success": True,
+                "messages": [serialize_chat_message(m) for m in page],
+                "last_id": page[-1].id if page else since_id,
+                "has_more": has_more
+            })
+
+        if before_id is not None:
+            messages = messages.filter(id__lt=before_id)
+        page = list(messages.order_by("-id")[:limit + 1])
+        has_older = len(page) > limit
+        page = page[:limit][::-1]
         return Response({
             "success": True,
-            "messages": [{
-                "id": m.id,
-                "sender": m.sender.username,
-                "message": m.message,
-                "timestamp": m.timestamp
-            } for m in messages]
+            "messages": [serialize_chat_message(m) for m in page],
+            "first_id": page[0].id if page else before_id,
+            "last_id": page[-1].id if page else None,
+            # Paging backwards: nothing newer to fetch after this page
+            "has_more": False,
+            "has_older": has_older
         })
     except GameRoom.DoesNotExist:
         return Response({"error": "Game room not found"}, status=404)
@@ -556,71 +739,58 @@ def get_chat_messages(request, pin):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def get_leaderboard(request, game_code):
-    try:
-        # Get the game room
-        game_room = GameRoom.objects.get(pin=game_code)
-        
-        # Check if user is a player in this game
-        if not game_room.players.filter(user=request.user).exists():
-            return Response({"error": "You are not a player in this game"}, status=403)
-        
-        # Get all players in the game with their stats
-        players = []
-        for player in game_room.players.all():
-            players.append({
-                'user_id': player.user.id,
-                'username': player.user.username,
-                'score': player.score,
-                'best_streak': player.best_streak,
-                'correct_answers': player.correct_answers,
-                'average_time': player.average_time
-            })
-        
-        # Sort by score descending
-        players = sorted(players, key=lambda x: x['score'], reverse=True)
-        
-        return Response({
-            'success': True,
-            'players': players,
-            'game_title': game_room.quiz_data.get('title', 'Quiz Game') if game_room.quiz_data else 'Quiz Game'
-        })
-        
-    except GameRoom.DoesNotExist:
-        return Response({"error": "Game room not found"}, status=404)
-    except Exception as e:
-        return Response({"error": str(e)}, status=400)
+def global_leaderboard(request):
+    """
+    Every player's total score across games, best first (``?limit=K``,
+    default 100), with the requesting user's own rank.
+    """
+    limit = leaderboard_limit(request) or GLOBAL_LEADERBOARD_SIZE
+    top, me = standings(get_global_leaderboard(), request.user.username, limit)
+    return Response({
+        'success': True,
+        'leaderboard': top,
+        'me': me
+    })
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def answer_distribution(request, pin):
+    """
+    How many players picked each option of the current question. Served from
+    the room's live counters when this process holds the room, otherwise
+    from one grouped COUNT.
+    """
     try:
-        room = GameRoom.objects.get(code=pin)
-        players = Player.objects.filter(game=room)
-
-        # ✅ FIXED: Use the correct field name
-        current_question_index = room.current_question
-
-        # Safely extract question from quiz_data
-        questions = room.quiz_data.get("questions", [])
-        if current_question_index >= len(questions):
+        state = peek_room(pin)
+        if state is not None:
+            live = state.distribution()
+            question = state.quiz.question(live['current_question'])
+            counts = live['counts']
+            all_answered = live['answered'] >= live['players']
+        else:
+            room = GameRoom.objects.get(code=pin)
+            question = get_compiled_quiz(room.pk, room.quiz_data).question(room.current_question)
+            counts = None
+        if question is None:
             return Response({"error": "Invalid question index"}, status=400)
 
-        current_question = questions[current_question_index]
-        options = current_question.get("options", [])
-        correct_index = current_question.get("correct_answer")
-
-        # Build distribution
-        distribution = []
-        for idx, option_text in enumerate(options):
-            count = players.filter(current_answer=idx).count()
-            distribution.append({
-                "answer": option_text,
-                "count": count
-            })
-
-        all_answered = all(p.current_answer is not None for p in players)
-        correct_answer_text = options[correct_index] if all_answered else None
+        options = question.options
+        if counts is None:
+            # One query: players per answer, NULL being those yet to answer
+            answers = dict(
+                Player.objects.filter(game=room)
+                .values_list('current_answer')
+                .annotate(count=Count('id'))
+                .order_by()
+            )
+            counts = [answers.get(idx, 0) for idx in range(len(options))]
+            all_answered = answers.get(None, 0) == 0
+
+        distribution = [
+            {"answer": option_text, "count": count}
+            for option_text, count in zip(options, counts)
+        ]
+        correct_answer_text = options[question.correct_index] if all_answered else None
 
         return Response({
             "distribution": distribution,
@@ -631,4 +801,4 @@ def answer_distribution(request, pin):
     except GameRoom.DoesNotExist:
         return Response({"error": "Room not found"}, status=404)
     except Exception as e:
-        return Response({"error": str(e)}, status=500)
\ No newline at end of file
+        return Response({"error": str(e)}, status=500)
@@ -15,9 +15,11 @@ const Chat = ({ pin, currentUser }) => {
   const [showEmojiPicker, setShowEmojiPicker] = useState(false);
   const [isTyping, setIsTyping] = useState(false);
   const [typingTimeout, setTypingTimeout] = useState(null);
-  const lastMessageCount = useRef(0);
+  const lastMessageId = useRef(null);
+  const isOpenRef = useRef(false);
 
   const API_URL = 'https://mindclash-mm6g.onrender.com/api';
+  const WS_URL = 'wss://mindclash-mm6g.onrender.com';
 
   const commonEmojis = [
     '😊', '😂', '❤️', '👍', '🎮', '🎯', '🎲', '🎪', '🎨', '🎭',
@@ -43,31 +45,61 @@ const Chat = ({ pin, currentUser }) => {
   }, [messages]);
 
   useEffect(() => {
+    isOpenRef.current = isOpen;
+  }, [isOpen]);
+
+  useEffect(() => {
+    lastMessageId.current = null;
+    setMessages([]);
+
+    const addMessages = (incoming) => {
+      const fresh = incoming.filter(m => lastMessageId.current === null || m.id > lastMessageId.current);
+      if (fresh.length === 0) return;
+      lastMessageId.current = fresh[fresh.length - 1].id;
+      setMessages(prev => [...prev, ...fresh]);
+      // Update unread count if chat is closed
+      if (!isOpenRef.current) {
+        setUnreadCount(prev => prev + fresh.length);
+      }
+    };
+
+    // Only fetch what we have not seen yet
     const fetchMessages = async () => {
       try {
         const token = localStorage.getItem('authToken');
+        const params = lastMessageId.current === null ? {} : { since_id: lastMessageId.current };
         const response = await axios.get(`${API_URL}/chat/${pin}/`, {
-          headers: { Authorization: `Token ${token}` }
+          headers: { Authorization: `Token ${token}` },
+          params
         });
-
-        // Update unread count if chat is closed and there are new messages
-        if (!isOpen && response.data.messages.length > lastMessageCount.current) {
-          setUnreadCount(prev => prev + (response.data.messages.length - lastMessageCount.current));
-        }
-
-        setMessages(response.data.messages);
-        lastMessageCount.current = response.data.messages.length;
+        addMessages(response.data.messages);
         setError(null);
+        if (response.data.has_more) {
+          fetchMessages();
+        }
       } catch (error) {
         console.error('Error fetching messages:', error);
         setError('Failed to load messages');
       }
     };
 
+    // New messages are pushed over the room socket; polling is a slow safety net
+    const token = localStorage.getItem('authToken');
+    const socket = new WebSocket(`${WS_URL}/ws/game/${pin}/?mode=watch`, token ? ['token', token] : []);
+    socket.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      if (data.type === 'chat_message') {
+        addMessages([data.message]);
+      }
+    };
+
     fetchMessages();
-    const interval = setInterval(fetchMessages, 3000);
-    return () => clearInterval(interval);
-  }, [pin, isOpen]);
+    const interval = setInterval(fetchMessages, 15000);
+    return () => {
+      clearInterval(interval);
+      socket.close();
+    };
+  }, [pin]);
 
   const handleSendMessage = async (e) => {
     e.preventDefault();
@@ -54,6 +54,14 @@
             }
         };
 
+        // Streamed generation opened the room with its first question; the
+        // rest of the questions are added to it while the lobby fills up
+        const handleGameCreated = (code) => {
+            setQuizData({ streaming: true });
+            setGameCode(code);
+            setError('');
+        };
+
         const handleStartGame = async () => {
             try {
                 if (!gameCode) return;
@@ -106,7 +114,7 @@
                                             First, create quiz questions for your multiplayer game
                                         </p>
                                     </div>
-                                    <QuizGeneratorStandalone onQuizGenerated={handleQuizGenerated} />
+                                    <QuizGeneratorStandalone onQuizGenerated={handleQuizGenerated} onGameCreated={handleGameCreated} />
                                 </>
                             ) : loading ? (
                                 <div className="flex flex-col items-center justify-center py-16">
@@ -31,7 +31,7 @@ const GameRoom = () => {
   const [correctAnswer, setCorrectAnswer] = useState('');
 
   const timerRef = useRef(null);
-  const startTimeRef = useRef(null);
+  const deadlineRef = useRef(null);
 
   useEffect(() => {
     if (showResults && gameState?.status === 'in_progress') {
@@ -105,9 +105,7 @@ const GameRoom = () => {
           setGameState(game);
           if (game.status === 'in_progress' && game.current_question_data) {
             setCurrentQuestion(game.current_question_data);
-            const timePerQuestion = game.quiz_data?.timePerQuestion || 30;
-            setTotalTime(timePerQuestion);
-            setTimeLeft(timePerQuestion);
+            startTimer(game);
           }
         }
 
@@ -115,7 +113,8 @@ const GameRoom = () => {
           .on('gameStateUpdate', handleGameStateUpdate)
           .on('gameStarted', handleGameStarted)
           .on('nextQuestion', handleNextQuestion)
-          .on('answerSubmitted', handleAnswerSubmitted);
+          .on('answerSubmitted', handleAnswerSubmitted)
+          .on('questionClosed', handleQuestionClosed);
       } catch (err) {
         setError(err.error || 'Failed to connect to game');
       } finally {
@@ -148,11 +147,7 @@ const GameRoom = () => {
     if (!game) return;
     setGameState(game);
     setCurrentQuestion(game.current_question_data);
-    const timePerQuestion = game.quiz_data?.timePerQuestion || 30;
-    setTotalTime(timePerQuestion);
-    setTimeLeft(timePerQuestion);
-    startTimeRef.current = Date.now();
-    startTimer();
+    startTimer(game);
   };
 
   const handleNextQuestion = (data) => {
@@ -163,11 +158,7 @@ const GameRoom = () => {
     setSelectedAnswer(null);
     setAnswerResult(null);
     setShowResults(false);
-    const timePerQuestion = game.quiz_data?.timePerQuestion || 30;
-    setTotalTime(timePerQuestion);
-    setTimeLeft(timePerQuestion);
-    startTimeRef.current = Date.now();
-    startTimer();
+    startTimer(game);
     setAllPlayersAnswered(false);
   };
 
@@ -175,6 +166,11 @@ const GameRoom = () => {
     console.log('Answer submitted by', data.player);
   };
 
+  const handleQuestionClosed = (closed) => {
+    const mine = closed.answers?.find((a) => a.username === user?.username);
+    if (mine) setAnswerResult(mine.is_correct ? 'correct' : 'incorrect');
+  };
+
   const handleStartGameClick = async () => {
     try {
       if (!gameCode || !isHost) return;
@@ -188,24 +184,25 @@ const GameRoom = () => {
     }
   };
 
-  const startTimer = () => {
+  // The server owns the deadline: it closes answering and moves the room on,
+  // so the countdown only renders question_ends_at.
+  const startTimer = (game) => {
     if (timerRef.current) clearInterval(timerRef.current);
-    startTimeRef.current = Date.now();
-    timerRef.current = setInterval(() => {
-      const elapsed = (Date.now() - startTimeRef.current) / 1000;
-      const remaining = Math.max(0, totalTime - elapsed);
+    const timePerQuestion = game.quiz_data?.timePerQuestion || 30;
+    setTotalTime(timePerQuestion);
+    deadlineRef.current = game.question_ends_at
+      ? Date.parse(game.question_ends_at)
+      : Date.now() + timePerQuestion * 1000;
+    const tick = () => {
+      const remaining = Math.max(0, (deadlineRef.current - Date.now()) / 1000);
       setTimeLeft(remaining);
       if (remaining <= 0) {
         clearInterval(timerRef.current);
-        handleTimeUp();
+        setShowResults(true);
       }
-    }, 100);
-  };
-
-  const handleTimeUp = () => {
-    if (selectedAnswer === null && gameState?.status === 'in_progress') {
-      handleSubmitAnswer(-1);
-    }
+    };
+    tick();
+    timerRef.current = setInterval(tick, 250);
   };
 
   const handleAnswerSelect = (index) => {
@@ -222,8 +219,6 @@ const GameRoom = () => {
       if (response.success) {
         setScoreAnimation(true);
         setTimeout(() => setScoreAnimation(false), 1500);
-        if (response.correct === true) setAnswerResult('correct');
-        else if (response.correct === false) setAnswerResult('incorrect');
       }
     } catch (err) {
       console.error("Failed to submit answer:", err);
@@ -1,8 +1,9 @@
 import React, { useState, useEffect } from 'react';
 import { api } from '../services/AuthService';
+import GameService from '../services/GameService';
 import '../styles/QuizGenerator.css';
 
-const QuizGeneratorStandalone = ({ onQuizGenerated }) => {
+const QuizGeneratorStandalone = ({ onQuizGenerated, onGameCreated }) => {
   const [formData, setFormData] = useState({
     topic: '',
     count: 5,
@@ -10,6 +11,7 @@ const QuizGeneratorStandalone = ({ onQuizGenerated }) => {
   });
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  const [questionsReady, setQuestionsReady] = useState(0);
 
   const handleInputChange = (e) => {
     const { name, value } = e.target;
@@ -29,6 +31,28 @@ const QuizGeneratorStandalone = ({ onQuizGenerated }) => {
       
       console.log('Sending quiz generation request with data:', { topic, count, difficulty });
       
+      if (onGameCreated) {
+        // Stream the quiz: the room opens as soon as question 1 is ready
+        setQuestionsReady(0);
+        let streamError = null;
+        await GameService.streamQuiz(
+          { topic, count, difficulty, create_game: true },
+          (event, data) => {
+            if (event === 'question') {
+              setQuestionsReady(data.index + 1);
+            } else if (event === 'game') {
+              onGameCreated(data.game_code);
+            } else if (event === 'error') {
+              streamError = data.error;
+            }
+          }
+        );
+        if (streamError) {
+          throw new Error(streamError);
+        }
+        return;
+      }
+      
       const result = await api.post('/api/generate-quiz/', {
         topic,
         count,
@@ -48,7 +72,7 @@ const QuizGeneratorStandalone = ({ onQuizGenerated }) => {
 
     } catch (err) {
       console.error('Quiz generation error:', err);
-      setError(err.response?.data?.detail || err.message || 'Failed to generate quiz. Please try again.');
+      setError(err.response?.data?.detail || err.message || err.error || 'Failed to generate quiz. Please try again.');
     } finally {
       setLoading(false);
     }
@@ -117,7 +141,9 @@ const QuizGeneratorStandalone = ({ onQuizGenerated }) => {
           className="generate-btn"
           disabled={loading || !formData.topic.trim()}
         >
-          {loading ? 'Generating...' : 'Generate Quiz'}
+          {loading
+            ? (questionsReady > 0 ? `Generating... (${questionsReady}/${formData.count} ready)` : 'Generating...')
+            : 'Generate Quiz'}
         </button>
       </form>
 
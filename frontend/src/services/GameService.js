@@ -146,6 +146,50 @@ const GameService = {
         } catch (error) {
             throw error.response?.data || { error: 'Failed to get leaderboard' };
         }
+    },
+
+    /**
+     * Generate a quiz, receiving each question as soon as the server has it
+     * @param {Object} params - topic, count, difficulty and optionally create_game
+     * @param {Function} onEvent - Called with (event, data) for every server-sent event
+     * @returns {Promise} - A promise that resolves when the stream ends
+     */
+    streamQuiz: async (params, onEvent) => {
+        const token = localStorage.getItem('authToken');
+        const response = await fetch(`${API_URL}/api/generate-quiz/stream/`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                Authorization: `Bearer ${token}`
+            },
+            body: JSON.stringify(params)
+        });
+        if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
+            throw { error: data.error || data.detail || 'Failed to generate quiz' };
+        }
+
+        // Split the text/event-stream body into "event:" / "data:" blocks
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let end;
+            while ((end = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, end);
+                buffer = buffer.slice(end + 2);
+                let event = 'message';
+                let data = '';
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                onEvent(event, data ? JSON.parse(data) : null);
+            }
+        }
     }
 };
 
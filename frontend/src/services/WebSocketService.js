@@ -1,12 +1,28 @@
 import axios from 'axios';
 
 const API_URL = 'https://mindclash-mm6g.onrender.com';
+const WS_URL = API_URL.replace(/^http/, 'ws');
+
+// Status is pushed over a watch-only socket; we only poll while it is down
+const FALLBACK_POLL_MS = 2000;
+const RECONNECT_MIN_MS = 1000;
+const RECONNECT_MAX_MS = 30000;
+
+// Pushes that move the game along (and change scores or the question) are
+// followed by a status refetch; per-player patches are applied locally
+const PHASE_EVENTS = new Set([
+    'game_state', 'game_started', 'question_closed', 'next_question', 'game_status_changed'
+]);
 
 class WebSocketService {
     constructor() {
         this.polling = false;
         this.pollInterval = null;
+        this.socket = null;
+        this.reconnectTimer = null;
+        this.reconnectAttempts = 0;
         this.gameCode = null;
+        this._etag = null;
         this._prevGameState = null;
         this._prevQuestion = null;
         this.listeners = {
@@ -14,6 +30,7 @@ class WebSocketService {
             gameStarted: [],
             nextQuestion: [],
             answerSubmitted: [],
+            questionClosed: [],
             gameEnded: []
         };
     }
@@ -26,16 +43,101 @@ class WebSocketService {
         this.gameCode = gameCode;
         this.polling = true;
         
-        // Start polling for game state updates
-        this.pollInterval = setInterval(() => this.pollGameState(), 2000); // Poll every 2 seconds
+        // Poll quickly until the push socket is up
+        this.setPollInterval(FALLBACK_POLL_MS);
+        this.openSocket();
         
         // Initial poll to get the current state
         this.pollGameState();
         
-        console.log('Started polling for game updates');
+        console.log('Started listening for game updates');
         
         return this;
     }
+
+    setPollInterval(ms) {
+        this.stopPolling();
+        this.pollInterval = setInterval(() => this.pollGameState(), ms);
+    }
+
+    stopPolling() {
+        if (this.pollInterval) {
+            clearInterval(this.pollInterval);
+            this.pollInterval = null;
+        }
+    }
+
+    openSocket() {
+        // Browsers can't set headers on a socket, so the token rides as a subprotocol
+        const token = localStorage.getItem('authToken');
+        const socket = new WebSocket(
+            `${WS_URL}/ws/game/${this.gameCode}/?mode=watch`,
+            token ? ['token', token] : []
+        );
+        // The server's game_state on connect makes us catch up
+        socket.onopen = () => {
+            this.reconnectAttempts = 0;
+            this.stopPolling();
+        };
+        socket.onmessage = (event) => this.handlePush(JSON.parse(event.data));
+        socket.onclose = () => {
+            if (this.socket === socket && this.polling) {
+                this.socket = null;
+                this.setPollInterval(FALLBACK_POLL_MS);
+                this.scheduleReconnect();
+            }
+        };
+        this.socket = socket;
+    }
+
+    scheduleReconnect() {
+        const delay = Math.min(RECONNECT_MIN_MS * 2 ** this.reconnectAttempts, RECONNECT_MAX_MS);
+        this.reconnectAttempts += 1;
+        this.reconnectTimer = setTimeout(() => {
+            this.reconnectTimer = null;
+            if (this.polling) {
+                this.openSocket();
+            }
+        }, delay);
+    }
+
+    handlePush(message) {
+        if (message.type === 'question_closed') {
+            // Who answered what, and whether it was right, is only sent at the reveal
+            const closed = message.ops.find(op => op.op === 'question_closed');
+            if (closed) this.notifyListeners('questionClosed', closed);
+        }
+        if (message.type === 'game_state_patch') {
+            this.applyPatch(message.ops);
+        } else if (PHASE_EVENTS.has(message.type)) {
+            this.pollGameState();
+        }
+    }
+
+    // Apply per-player ops (answered, ready, joined) to the last status
+    // instead of refetching it for every answer
+    applyPatch(ops) {
+        const game = this._prevGameState;
+        if (!game || !game.players) {
+            this.pollGameState();
+            return;
+        }
+        for (const op of ops) {
+            const player = game.players.find(p => p.username === (op.username || op.player?.username));
+            if (op.op === 'answered' && player) {
+                player.has_answered = true;
+            } else if (op.op === 'ready' && player) {
+                player.is_ready = op.is_ready;
+            } else if (op.op === 'player_joined' && !player) {
+                game.players.push({ ...op.player, is_host: op.player.username === game.host });
+            } else if (op.op !== 'player_joined') {
+                // Something we can't apply locally
+                this.pollGameState();
+                return;
+            }
+        }
+        this.notifyListeners('gameStateUpdate', JSON.parse(JSON.stringify(game)));
+    }
     
     async pollGameState() {
         if (!this.polling || !this.gameCode) return;
@@ -47,10 +149,19 @@ class WebSocketService {
                 throw new Error('Authentication required');
             }
             
+            const headers = { Authorization: `Token ${token}` };
+            if (this._etag) {
+                headers['If-None-Match'] = this._etag;
+            }
             const response = await axios.get(`${API_URL}/api/game/${this.gameCode}/status/`, {
-                headers: { Authorization: `Token ${token}` }
+                headers,
+                validateStatus: status => (status >= 200 && status < 300) || status === 304
             });
             
+            // Unchanged since our last fetch
+            if (response.status === 304) return;
+            this._etag = response.headers.etag || null;
+            
             if (response.data && response.data.success && response.data.game) {
                 const gameData = response.data.game;
                 if (!gameData) {
@@ -128,12 +239,20 @@ class WebSocketService {
     }
 
     disconnect() {
-        if (this.pollInterval) {
-            clearInterval(this.pollInterval);
-            this.pollInterval = null;
+        this.stopPolling();
+        if (this.reconnectTimer) {
+            clearTimeout(this.reconnectTimer);
+            this.reconnectTimer = null;
+        }
+        this.reconnectAttempts = 0;
+        if (this.socket) {
+            const socket = this.socket;
+            this.socket = null;
+            socket.close();
         }
         this.polling = false;
         this.gameCode = null;
+        this._etag = null;
         this._prevGameState = null;
         this._prevQuestion = null;
         console.log('Polling disconnected');